@@ -1,73 +1,165 @@
 """
 API Endpoints - Main Chat Endpoint
 Handles incoming scam messages, generates responses, and manages callbacks.
+/chat returns the whole reply at once; /chat/stream streams it over Server-Sent Events.
 """
 
-from fastapi import APIRouter, Header, HTTPException, BackgroundTasks
+import asyncio
+import json
+import time
+from typing import Awaitable, Dict, Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
+from app.core.logging import bind_session, get_logger
 from app.models.schemas import IncomingRequest, APIResponse, EngagementMetrics
-from app.services import gemini_agent, intelligence, reporting
-from app.services.session_manager import session_manager
+from app.services import context_manager, fused_agent, gemini_agent, intelligence, json_repair, metrics, reporting
+from app.services.deadline import Deadline, persona_latency
+from app.services.intel_index import INDEXED_KINDS, intel_index
+from app.services.llm_backend import get_backend
+from app.services.reply_cache import reply_cache
+from app.services.resilience import ResilientBackend
+from app.services.similarity_index import similarity_index
+from app.services.session_manager import SessionData, session_manager
 from app.core.config import settings
 
 router = APIRouter()
+logger = get_logger(__name__)
 
-@router.post("/chat", response_model=APIResponse)
-async def chat_endpoint(
-    payload: IncomingRequest,
-    background_tasks: BackgroundTasks,
-    x_api_key: str = Header(None)
-):
+def _check_api_key(x_api_key: str):
+    if not settings.YOUR_SECRET_API_KEY or x_api_key != settings.YOUR_SECRET_API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+
+def _check_kind(kind: Optional[str]):
+    if kind is not None and kind not in INDEXED_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(INDEXED_KINDS)}")
+
+async def _start_turn(payload: IncomingRequest, x_api_key: str):
     """
-    Main chat endpoint for the Honeypot Agent.
+    Steps 1-3 of a chat turn: auth, session lookup, logging and prompt context.
     
-    Receives a message from a potential scammer, analyzes it, generates a response,
-    and returns immediate metrics while potentially triggering a final callback.
+    Returns:
+        (session, context, deadline)
     """
     
     # 1. Security Check
-    if x_api_key != settings.YOUR_SECRET_API_KEY:
-        raise HTTPException(status_code=401, detail="Invalid API Key")
+    with metrics.stage("auth"):
+        _check_api_key(x_api_key)
+    
+    # The whole turn must be answered within the request budget
+    deadline = Deadline()
     
     # 2. Get or Create Session
-    session = session_manager.get_or_create_session(payload.sessionId)
+    with metrics.stage("session_lookup"):
+        session = await session_manager.get_or_create_session_async(payload.sessionId)
     
-    # 3. Log Incoming Message
-    print(f"\n{'='*60}")
-    print(f"[🔴 SCAMMER]: {payload.message.text}")
-    print(f"Session: {payload.sessionId} | Message #{session.message_count + 1}")
+    # 3. Log Incoming Message (every record of this request carries the session ID)
+    bind_session(payload.sessionId)
+    logger.info("Scammer message", extra={"message_number": session.message_count + 1, "text": payload.message.text})
     
-    # 4. Analyze Message for Intelligence
-    analysis = intelligence.analyze_message(
-        conversation_history=payload.conversationHistory,
-        current_message_text=payload.message.text
-    )
+    # Keep the last turns verbatim, fold older ones into the session's rolling summary
+    with metrics.stage("context"):
+        context = context_manager.update_context(session, payload.conversationHistory)
+    return session, context, deadline
+
+def _start_analysis(
+    payload: IncomingRequest,
+    session: SessionData,
+    deadline: Deadline,
+    fused: Optional[fused_agent.FusedTurn] = None
+):
+    """
+    Step 4 of a chat turn: analyze the message in the background while the reply
+    is generated. Both are independent LLM round-trips, so run them side by side.
+    After a fused attempt, its local analysis (or rule scan) is reused.
     
-    # 5. Generate Agent Response
-    agent_reply = gemini_agent.generate_response(
-        history=payload.conversationHistory,
-        current_msg_text=payload.message.text
+    Returns:
+        (analysis_task, analysis_deadline)
+    """
+    loop = asyncio.get_running_loop()
+    analysis_deadline = loop.time() + min(
+        settings.ANALYSIS_TIMEOUT_SECONDS,
+        deadline.remaining(settings.REQUEST_BUDGET_RESERVE_SECONDS)
     )
+    if fused is not None and fused.analysis is not None:
+        analysis_task = loop.create_future()
+        analysis_task.set_result(fused.analysis)
+        return analysis_task, analysis_deadline
+    analysis_task = asyncio.ensure_future(_timed("analysis", intelligence.analyze_message_async(
+        session=session,
+        conversation_history=payload.conversationHistory,
+        current_message_text=payload.message.text,
+        turn_number=_turn_number(session),
+        rule_result=fused.rule_result if fused is not None else None
+    )))
+    return analysis_task, analysis_deadline
+
+async def _timed(stage: str, awaitable: Awaitable):
+    """Await and record the time in the stage histogram (also when cancelled by a timeout)"""
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        metrics.observe_stage(stage, time.perf_counter() - started)
+
+def _turn_number(session: SessionData) -> int:
+    return session.message_count // 2 + 1
+
+async def _collect_analysis(
+    payload: IncomingRequest,
+    session: SessionData,
+    analysis_task: asyncio.Future,
+    analysis_deadline: float
+) -> Dict:
+    """Wait for the background analysis until its deadline, else fall back to regex."""
+    loop = asyncio.get_running_loop()
+    try:
+        remaining = max(0.0, analysis_deadline - loop.time())
+        analysis = await asyncio.wait_for(analysis_task, timeout=remaining)
+    except asyncio.TimeoutError:
+        logger.warning("Intelligence analysis ran out of time, using regex fallback")
+        analysis = intelligence.regex_analysis(
+            intelligence.unscanned_transcript(session, payload.conversationHistory, payload.message.text),
+            "AI analysis timed out."
+        )
+    return analysis
+
+async def _finish_turn(
+    payload: IncomingRequest,
+    session: SessionData,
+    analysis: Dict,
+    agent_reply: str
+) -> APIResponse:
+    """Steps 6-9 of a chat turn: update the session, callback and respond."""
     
     # 6. Update Session State
+    update_started = time.perf_counter()
     session.add_message("scammer", payload.message.text)
     session.add_message("user", agent_reply)  # Ram Lal is the "user"
     session.scam_detected = analysis["is_scam"]
-    session.update_intelligence(
+    new_intelligence = session.update_intelligence(
         intelligence=analysis["extracted_intelligence"],
-        agent_notes=analysis["agent_notes"]
+        agent_notes=analysis["agent_notes"],
+        from_model=analysis["tier"] in ("llm", "fused")
     )
+    session.mark_extracted(len(payload.conversationHistory))
+    if intel_index is not None:
+        intel_index.record(payload.sessionId, new_intelligence)
     
     # 7. Log Outgoing Message
-    print(f"[🟢 RAM LAL]: {agent_reply}")
-    print(f"[🔍 INTEL]: {session.intelligence_extracted_count} items | Scam: {session.scam_detected}")
+    logger.info("Agent reply", extra={
+        "reply": agent_reply,
+        "intelligence_items": session.intelligence_extracted_count,
+        "scam_detected": session.scam_detected,
+        "tier": analysis["tier"]
+    })
+    metrics.analysis_total.labels(analysis["tier"]).inc()
     
     # 8. Check if Final Callback Should Be Sent
     if session.should_send_final_callback():
-        print(f"[📤 CALLBACK]: Triggering final callback for {payload.sessionId}")
+        logger.info("Triggering final callback")
         
-        # Add background task to send final callback
-        background_tasks.add_task(
-            reporting.send_final_callback,
+        # Queue the final callback for async delivery
+        reporting.enqueue_final_callback(
             session_id=payload.sessionId,
             scam_detected=session.scam_detected,
             total_messages=session.message_count,
@@ -78,6 +170,10 @@ async def chat_endpoint(
         # Mark callback as sent to avoid duplicates
         session_manager.mark_callback_sent(payload.sessionId)
     
+    # Persist all of this turn's session changes in one write
+    await session_manager.save_session_async(session)
+    metrics.observe_stage("session_update", time.perf_counter() - update_started)
+    
     # 9. Return Immediate Response
     response = APIResponse(
         status="success",
@@ -88,13 +184,204 @@ async def chat_endpoint(
             totalMessagesExchanged=session.message_count
         ),
         extractedIntelligence=session.get_extracted_intelligence(),
-        agentNotes=analysis["agent_notes"]
+        agentNotes=analysis["agent_notes"],
+        analysisTier=analysis["tier"]
     )
     
-    print(f"{'='*60}\n")
-    
     return response
 
+def _sse_event(event: str, data: str) -> str:
+    """Format one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@router.post("/chat", response_model=APIResponse)
+async def chat_endpoint(
+    payload: IncomingRequest,
+    x_api_key: str = Header(None)
+):
+    """
+    Main chat endpoint for the Honeypot Agent.
+    
+    Receives a message from a potential scammer, analyzes it, generates a response,
+    and returns immediate metrics while potentially triggering a final callback.
+    
+    In fused mode (LLM_FUSED_MODE) turns that need the LLM for both the reply and
+    the analysis make a single combined call, falling back to the split calls.
+    """
+    started = time.perf_counter()
+    session, context, deadline = await _start_turn(payload, x_api_key)
+    
+    fused = None
+    if settings.LLM_FUSED_MODE:
+        fused = await _timed("fused", fused_agent.fused_turn(
+            session=session,
+            context=context,
+            conversation_history=payload.conversationHistory,
+            current_message_text=payload.message.text,
+            turn_number=_turn_number(session),
+            deadline=deadline
+        ))
+        if fused.reply is not None:
+            response = await _finish_turn(payload, session, fused.analysis, fused.reply)
+            return _respond(response, started)
+    
+    analysis_task, analysis_deadline = _start_analysis(payload, session, deadline, fused)
+    
+    # 5. Generate Agent Response
+    agent_reply = await _timed("reply", gemini_agent.generate_response_async(
+        history=context.recent,
+        current_msg_text=payload.message.text,
+        summary=context.summary,
+        deadline=deadline
+    ))
+    
+    analysis = await _collect_analysis(payload, session, analysis_task, analysis_deadline)
+    response = await _finish_turn(payload, session, analysis, agent_reply)
+    return _respond(response, started)
+
+
+def _respond(response: APIResponse, started: float) -> Response:
+    """Serialize the turn's response (timed as its own stage) and record the turn latency"""
+    with metrics.stage("serialize"):
+        body = response.model_dump_json()
+    metrics.chat_request_seconds.labels("chat").observe(time.perf_counter() - started)
+    return Response(content=body, media_type="application/json")
+
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(
+    payload: IncomingRequest,
+    x_api_key: str = Header(None)
+):
+    """
+    Streaming variant of /chat over Server-Sent Events.
+    
+    Sends "token" events ({"text": ...}) as the reply is generated, then a single
+    "result" event carrying the same body /chat would return (intelligence and metrics).
+    Always uses split calls: a fused JSON reply cannot be streamed token by token.
+    """
+    started = time.perf_counter()
+    session, context, deadline = await _start_turn(payload, x_api_key)
+    
+    async def events():
+        # Started here rather than before the response: a client that disconnects
+        # before the body is iterated never runs the generator at all
+        analysis_task, analysis_deadline = _start_analysis(payload, session, deadline)
+        chunks = []
+        reply_started = time.perf_counter()
+        try:
+            # 5. Stream Agent Response
+            async for chunk in gemini_agent.stream_response_async(
+                history=context.recent,
+                current_msg_text=payload.message.text,
+                summary=context.summary,
+                deadline=deadline
+            ):
+                chunks.append(chunk)
+                yield _sse_event("token", json.dumps({"text": chunk}))
+            
+            metrics.observe_stage("reply", time.perf_counter() - reply_started)
+            
+            agent_reply = "".join(chunks).strip()
+            try:
+                analysis = await _collect_analysis(payload, session, analysis_task, analysis_deadline)
+                response = await _finish_turn(payload, session, analysis, agent_reply)
+                with metrics.stage("serialize"):
+                    body = response.model_dump_json()
+            except Exception:
+                # The status line has already gone out: report the failure in-stream
+                logger.exception("Chat turn failed after streaming the reply")
+                yield _sse_event("error", json.dumps({"detail": "Internal Server Error"}))
+                return
+            metrics.chat_request_seconds.labels("chat_stream").observe(time.perf_counter() - started)
+            yield _sse_event("result", body)
+        finally:
+            # Client went away mid-stream (cancelled or closed): don't leave the analysis running
+            if not analysis_task.done():
+                analysis_task.cancel()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/callbacks/status")
+def callback_status():
+    """Final callback delivery queue metrics"""
+    return reporting.callback_dispatcher.stats()
+
+
+@router.get("/reply-cache/status")
+def reply_cache_status():
+    """Persona reply cache size and hit rate"""
+    if reply_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **reply_cache.stats()}
+
+
+@router.get("/similarity-cache/status")
+def similarity_cache_status():
+    """Near-duplicate analysis cache size and hit rate"""
+    if similarity_index is None:
+        return {"enabled": False}
+    return {"enabled": True, **similarity_index.stats()}
+
+
+@router.get("/latency/status")
+def latency_status():
+    """Persona call latency percentiles, hedging and deadline counters"""
+    return persona_latency.stats()
+
+
+@router.get("/status/llm")
+def llm_status():
+    """Circuit breaker state, adaptive concurrency limit, fused-mode counters and JSON parse-failure rate of the model backend"""
+    backend = get_backend()
+    if isinstance(backend, ResilientBackend):
+        status = backend.stats()
+    else:
+        status = {"backend": backend.name, "circuit_state": "disabled"}
+    status["fused_mode"] = fused_agent.stats()
+    status["json_parse"] = json_repair.stats()
+    return status
+
+
+@router.get("/intel/status")
+def intel_status():
+    """Cross-session intelligence index size and lookup hit rate"""
+    if intel_index is None:
+        return {"enabled": False}
+    return {"enabled": True, **intel_index.stats()}
+
+
+@router.get("/intel/lookup")
+def intel_lookup(value: str, kind: Optional[str] = None, x_api_key: str = Header(None)):
+    """Sessions an entity (UPI ID, phone number, bank account or link) was seen in"""
+    _check_api_key(x_api_key)
+    _check_kind(kind)
+    if intel_index is None:
+        return {"enabled": False}
+    matches = intel_index.lookup(value, kind)
+    return {"enabled": True, "value": value, "seen": bool(matches), "matches": matches}
+
+
+@router.get("/intel/top")
+def intel_top(
+    kind: Optional[str] = None,
+    k: int = Query(10, ge=1, le=100),
+    by: str = Query("sessions", pattern="^(sessions|sightings)$"),
+    x_api_key: str = Header(None)
+):
+    """Entities seen in the most sessions (or most often), to link campaigns across sessions"""
+    _check_api_key(x_api_key)
+    _check_kind(kind)
+    if intel_index is None:
+        return {"enabled": False}
+    return {"enabled": True, "by": by, "entities": intel_index.top(kind, k, by)}
+
 
 @router.get("/health")
 def health_check():
@@ -1,10 +1,133 @@
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
-    # These match the variables in your .env file
-    GEMINI_API_KEY: str
-    YOUR_SECRET_API_KEY: str
-    GUVI_CALLBACK_URL: str
+    # These match the variables in your .env file. Missing values don't stop the
+    # import: the Gemini backend refuses to start without a key, /chat rejects every
+    # request without a secret, and callbacks go to the outbox without a URL.
+    GEMINI_API_KEY: str = ""
+    YOUR_SECRET_API_KEY: str = ""
+    GUVI_CALLBACK_URL: str = ""
+
+    # Max seconds (from the start of a turn) to wait for the intelligence analysis
+    ANALYSIS_TIMEOUT_SECONDS: float = 8.0
+
+    # End-to-end latency budget for a chat turn. The persona reply and the analysis
+    # must finish within it (minus the reserve kept for session update and response);
+    # when a stage runs out it degrades to the cached/fallback reply or regex analysis.
+    REQUEST_BUDGET_SECONDS: float = 2.5
+    REQUEST_BUDGET_RESERVE_SECONDS: float = 0.1
+    # Hedged persona calls: a second request once the first is slower than the p95
+    HEDGE_ENABLED: bool = True
+    HEDGE_PERCENTILE: float = 0.95
+    HEDGE_MIN_SAMPLES: int = 20  # below this, use the default delay
+    HEDGE_DEFAULT_DELAY_SECONDS: float = 1.0
+    HEDGE_MIN_DELAY_SECONDS: float = 0.2
+
+    # Size of the thread pool that runs blocking LLM calls (max in-flight model calls per worker)
+    LLM_THREAD_POOL_SIZE: int = 32
+
+    # LLM backend: "gemini" or "fake" (in-process stub for offline load testing)
+    LLM_BACKEND: str = "gemini"
+    LLM_MODEL_NAME: str = "gemini-flash-latest"
+
+    # Fake backend behaviour (only used when LLM_BACKEND=fake)
+    FAKE_LLM_LATENCY_MS: float = 800.0
+    FAKE_LLM_JITTER_MS: float = 200.0
+    FAKE_LLM_FAILURE_RATE: float = 0.0
+    FAKE_LLM_SEED: int = 42
+
+    # Fused mode: one JSON call returns both the persona reply and the analysis
+    # (only on turns that need the LLM for both; falls back to split calls)
+    LLM_FUSED_MODE: bool = False
+
+    # Circuit breaker + adaptive (AIMD) concurrency limit in front of all model calls
+    LLM_RESILIENCE_ENABLED: bool = True
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5  # consecutive failures that open the circuit
+    LLM_BREAKER_OPEN_SECONDS: float = 30.0  # how long to refuse calls before a probe
+    LLM_LIMITER_INITIAL: int = 8
+    LLM_LIMITER_MIN: int = 1
+    LLM_LIMITER_MAX: int = 32  # no point exceeding LLM_THREAD_POOL_SIZE
+    # Slower calls count as congestion; keep it below REQUEST_BUDGET_SECONDS, since calls
+    # cancelled by the request deadline only count once they have run this long
+    LLM_LIMITER_LATENCY_TARGET_SECONDS: float = 1.5
+    LLM_LIMITER_MAX_WAIT_SECONDS: float = 5.0  # calls over the limit queue this long before being refused
+
+    # Tiered analysis: skip the LLM when the rule engine's scam score reaches this
+    RULES_CONFIDENCE_THRESHOLD: float = 0.75
+    # ...but still run the LLM analysis every N turns to refresh agent notes (0 = never)
+    LLM_ANALYSIS_EVERY_N_TURNS: int = 5
+    # Messages of history sent verbatim to the LLM analyst (older turns are covered by the agent notes)
+    ANALYSIS_RECENT_MESSAGES: int = 6
+
+    # Upper bounds (estimated tokens) for the per-turn part of each prompt;
+    # the static persona/analyst instructions are sent as system instructions
+    PERSONA_PROMPT_TOKEN_BUDGET: int = 1500
+    ANALYSIS_PROMPT_TOKEN_BUDGET: int = 2000
+    # Last K turns (scammer + reply) stay verbatim; older ones fold into a rolling summary
+    CONTEXT_RECENT_TURNS: int = 4
+    CONTEXT_SUMMARY_TOKEN_BUDGET: int = 300
+    CONTEXT_MESSAGE_TOKEN_LIMIT: int = 300  # longer single messages are clipped
+
+    # Session store limits: least recently active sessions are evicted first
+    SESSION_MAX_ENTRIES: int = 100000
+    SESSION_MAX_MEMORY_MB: int = 512
+    # Sessions idle for longer than this are expired by the background sweeper
+    SESSION_IDLE_TTL_SECONDS: float = 3600.0
+    SESSION_SWEEP_INTERVAL_SECONDS: float = 60.0
+    # Session persistence: "memory" (per process) or "sqlite" (survives restarts, shared by workers)
+    SESSION_BACKEND: str = "memory"
+    SESSION_DB_PATH: str = "sessions.db"
+    # Per-session memory: the client resends the conversation every turn, so our own
+    # copy of the messages is off by default; only the latest agent notes are read
+    SESSION_KEEP_HISTORY: bool = False
+    SESSION_NOTES_KEPT: int = 1
+    # Entity strings (UPI IDs, phone numbers, ...) shared by all sessions; past the
+    # limit new values are stored per session instead
+    SESSION_ENTITY_TABLE_MAX: int = 200000
+
+    # Final callback delivery queue
+    CALLBACK_CONCURRENCY: int = 4
+    CALLBACK_MAX_RETRIES: int = 5
+    CALLBACK_BACKOFF_BASE_SECONDS: float = 0.5
+    CALLBACK_BACKOFF_MAX_SECONDS: float = 30.0
+    CALLBACK_TIMEOUT_SECONDS: float = 10.0
+    CALLBACK_QUEUE_MAXSIZE: int = 10000
+    # Payloads that could not be delivered are kept here and retried on the next start
+    CALLBACK_OUTBOX_DIR: str = "callback_outbox"
+    # How often the outbox is re-queued while running (0 = only at startup)
+    CALLBACK_OUTBOX_REPLAY_SECONDS: float = 60.0
+    # Optional batching: coalesce callbacks for a short window / up to a size limit.
+    # CALLBACK_BATCH_URL receives a JSON array; leave empty to send items one by one.
+    CALLBACK_BATCH_ENABLED: bool = False
+    CALLBACK_BATCH_WINDOW_SECONDS: float = 0.2
+    CALLBACK_BATCH_MAX_SIZE: int = 50
+    CALLBACK_BATCH_URL: str = ""
+
+    # Persona reply cache for repeated scam scripts
+    REPLY_CACHE_ENABLED: bool = True
+    REPLY_CACHE_MAX_ENTRIES: int = 10000
+    REPLY_CACHE_TTL_SECONDS: float = 3600.0
+    REPLY_CACHE_VARIANTS: int = 3  # distinct replies kept per key
+    REPLY_CACHE_WINDOW_MESSAGES: int = 2  # earlier scammer messages included in the key
+
+    # Near-duplicate cache for analysis verdicts (MinHash + LSH over the latest message)
+    SIMILARITY_CACHE_ENABLED: bool = True
+    SIMILARITY_THRESHOLD: float = 0.7  # estimated Jaccard similarity of character n-grams
+    SIMILARITY_MAX_ENTRIES: int = 5000
+    SIMILARITY_NUM_PERM: int = 64
+    SIMILARITY_BANDS: int = 16
+    SIMILARITY_SHINGLE_SIZE: int = 5
+    SIMILARITY_MIN_CHARS: int = 20  # shorter messages are too generic to reuse a verdict
+
+    # Cross-session index of extracted entities (UPI IDs, phones, accounts, links)
+    INTEL_INDEX_ENABLED: bool = True
+    INTEL_INDEX_MAX_ENTRIES: int = 200000  # least recently seen entities are evicted
+    INTEL_INDEX_SESSIONS_PER_ENTITY: int = 50  # most recent session IDs kept per entity
+
+    # Logging: queued JSON lines (or "text" for local development)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_SAMPLE_RATE: float = 1.0  # share of sessions whose INFO/DEBUG records are kept
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,148 @@
+"""
+Logging - Structured, Non-Blocking Log Pipeline
+Log calls only enqueue the record; a background listener thread formats it as a
+JSON line and writes it out, so the request path never blocks on stdout. Every
+record carries the session ID of the request it was logged from.
+"""
+
+import json
+import logging
+import queue
+import sys
+import time
+import zlib
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from app.core.config import settings
+
+# Session (correlation) ID of the request being handled in the current task
+correlation_id: ContextVar[str] = ContextVar("correlation_id", default="-")
+
+# Attributes every LogRecord has; anything else was passed via extra= and is emitted as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[QueueListener] = None
+
+
+def bind_session(session_id: str):
+    """Tag log records from the current task (and tasks it starts) with session_id"""
+    correlation_id.set(session_id)
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+class CorrelationFilter(logging.Filter):
+    """
+    Runs on the caller's side of the queue, so it can read the request's context:
+    attaches the correlation ID, then applies sampling. Records below WARNING are
+    kept for LOG_SAMPLE_RATE of sessions (decided per session, so a kept session's
+    trace is complete); warnings and errors are always kept.
+    """
+
+    def __init__(self, sample_rate: float = settings.LOG_SAMPLE_RATE):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.session_id = correlation_id.get()
+        if record.levelno >= logging.WARNING or self.sample_rate >= 1.0:
+            return True
+        bucket = zlib.crc32(record.session_id.encode()) % 10000
+        return bucket < self.sample_rate * 10000
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, session_id, msg and any extra= fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "session_id": getattr(record, "session_id", "-"),
+            "msg": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development (LOG_FORMAT=text)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(
+            f"{key}={value}" for key, value in vars(record).items()
+            if key not in _RECORD_ATTRS and key != "session_id"
+        )
+        line = (
+            f"{time.strftime('%H:%M:%S', time.localtime(record.created))} {record.levelname:<7} "
+            f"[{getattr(record, 'session_id', '-')}] {record.getMessage()}"
+        )
+        if fields:
+            line += f" | {fields}"
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class _EnqueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting (and JSON encoding) to the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback now, while the objects they refer
+        # to are still in the state they were logged in
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(level: str = settings.LOG_LEVEL, stream=None):
+    """
+    Route the "app" loggers through a queue to a background writer thread.
+    Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _EnqueueHandler(log_queue)
+    handler.addFilter(CorrelationFilter())
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    formatter = TextFormatter() if settings.LOG_FORMAT == "text" else JSONFormatter()
+    output.setFormatter(formatter)
+
+    root = logging.getLogger("app")
+    root.handlers = [handler]
+    root.setLevel(level.upper())
+    root.propagate = False
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+
+
+def shutdown_logging():
+    """
+    Flush queued records and stop the writer thread. Records logged afterwards
+    are written directly, until setup_logging() starts the queue again.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        logging.getLogger("app").handlers = list(_listener.handlers)
+        _listener = None
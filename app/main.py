@@ -3,21 +3,86 @@ Honeypot Agent API - Main Application
 FastAPI application for detecting and engaging with scammers.
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.api import endpoints
+from app.core.config import settings
+from app.core.logging import get_logger, setup_logging, shutdown_logging
+from app.services import fused_agent, json_repair, llm_client, metrics
+from app.services.deadline import persona_latency
+from app.services.llm_backend import get_backend, init_backend
+from app.services.reply_cache import reply_cache
+from app.services.reporting import callback_dispatcher
+from app.services.resilience import ResilientBackend
+from app.services.session_manager import session_manager
+from app.services.similarity_index import similarity_index
+from app.services.intel_index import intel_index
+
+# Queue-backed structured logging (see app/core/logging.py); restarted by each lifespan
+setup_logging()
+logger = get_logger(__name__)
+
+# --- METRICS SOURCES (read at scrape time) ---
+def _llm_stats():
+    backend = get_backend()
+    if not isinstance(backend, ResilientBackend):
+        return None
+    stats = backend.stats()
+    stats["circuit_open"] = int(stats["circuit_state"] != "closed")
+    return stats
+
+metrics.stats_collector.add("sessions", session_manager.stats, counters=("evicted", "expired"))
+metrics.stats_collector.add(
+    "reply_cache", lambda: reply_cache.stats() if reply_cache else None,
+    counters=("hits", "misses", "evictions")
+)
+metrics.stats_collector.add(
+    "similarity_cache", lambda: similarity_index.stats() if similarity_index else None,
+    counters=("hits", "misses", "evictions")
+)
+metrics.stats_collector.add(
+    "callbacks", callback_dispatcher.stats,
+    counters=("delivered", "rejected", "retries", "outboxed", "batches_sent", "batch_fallbacks")
+)
+metrics.stats_collector.add(
+    "llm", _llm_stats,
+    counters=("calls", "failures", "rejected_open", "rejected_limit", "times_opened", "waited", "cancelled_slow")
+)
+metrics.stats_collector.add("llm_fused", fused_agent.stats, counters=("fused_calls", "fallbacks"))
+metrics.stats_collector.add(
+    "llm_json_parse", json_repair.stats, counters=("attempts", "clean", "repaired", "failures")
+)
+metrics.stats_collector.add(
+    "intel_index", lambda: intel_index.stats() if intel_index is not None else None,
+    counters=("lookups", "lookup_hits", "evictions")
+)
+metrics.stats_collector.add(
+    "persona_latency", persona_latency.stats, counters=("hedges_fired", "hedges_skipped", "hedge_wins", "deadline_misses")
+)
 
 # --- LIFESPAN MANAGEMENT ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan management"""
     # Startup
-    print("🚀 Honeypot Agent API Starting...")
-    print("✅ Ready to engage scammers!")
+    setup_logging()
+    logger.info("Honeypot Agent API starting")
+    # The model provider (and its SDK) is loaded here, once, and shared by the persona and analysis
+    await init_backend()
+    if not settings.YOUR_SECRET_API_KEY:
+        logger.warning("YOUR_SECRET_API_KEY is not set; every /chat request will be rejected")
+    session_manager.start_sweeper()
+    await callback_dispatcher.start()
+    logger.info("Ready to engage scammers")
     yield
     # Shutdown
-    print("👋 Honeypot Agent API Shutting down...")
+    await callback_dispatcher.stop()
+    await session_manager.stop_sweeper()
+    session_manager.repository.close()
+    llm_client.shutdown()
+    logger.info("Honeypot Agent API shut down")
+    shutdown_logging()
 
 # Initialize the FastAPI Application
 app = FastAPI(
@@ -48,10 +113,19 @@ def root():
         "version": "2.0.0",
         "endpoints": {
             "chat": "/api/v1/chat",
-            "health": "/api/v1/health"
+            "chat_stream": "/api/v1/chat/stream",
+            "health": "/api/v1/health",
+            "intel_lookup": "/api/v1/intel/lookup",
+            "intel_top": "/api/v1/intel/top",
+            "metrics": "/metrics"
         }
     }
 
+# Prometheus scrape endpoint
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
 # Run the server
 if __name__ == "__main__":
     import uvicorn
@@ -59,6 +59,7 @@ class APIResponse(BaseModel):
     engagementMetrics: EngagementMetrics
     extractedIntelligence: ExtractedIntelligence
     agentNotes: str
+    analysisTier: Optional[str] = None  # Which analyzer produced this turn: "rules", "similar", "llm", "fused" or "regex_fallback"
 
 # ============================================================================
 # FINAL CALLBACK SCHEMA (What gets sent to GUVI endpoint)
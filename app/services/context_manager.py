@@ -0,0 +1,84 @@
+"""
+Context Manager - Bounded Conversation Context
+Keeps the last K turns verbatim and folds older turns into a rolling summary stored
+on the session, so prompt size (and turn latency) stays flat as a session grows.
+"""
+
+from typing import List
+from app.core.config import settings
+from app.models.schemas import ConversationMessage
+from app.services import prompts, rule_engine
+from app.services.session_manager import SessionData
+
+# Tokens kept per folded scammer message in the summary
+SUMMARY_LINE_TOKENS = 40
+
+class ContextWindow:
+    """What the prompts see of a conversation: a summary of older turns plus the recent ones"""
+    __slots__ = ("summary", "recent")
+
+    def __init__(self, summary: str, recent: List[ConversationMessage]):
+        self.summary = summary
+        self.recent = recent
+
+
+def summarize_message(msg: ConversationMessage) -> str:
+    """
+    One summary line for a folded message, or "" to drop it.
+
+    Only scammer messages that carry signals (payment details, links, numbers,
+    pressure keywords) are kept; our own replies and small talk add nothing the
+    agent notes and the extracted intelligence don't already cover.
+    """
+    if msg.sender != "scammer":
+        return ""
+    extracted = rule_engine.extract(msg.text)
+    if not any(extracted.values()):
+        return ""
+    return f"scammer: {prompts.clip_text(msg.text, SUMMARY_LINE_TOKENS)}"
+
+
+def trim_summary(lines: List[str], folded_count: int, token_budget: int) -> str:
+    """Header plus the newest summary lines that fit token_budget"""
+    header = f"({folded_count} earlier messages; key scammer lines below)"
+    kept = prompts.fit_lines(lines, token_budget - prompts.estimate_tokens(header) - 1)
+    return "\n".join([header] + kept)
+
+
+def update_context(
+    session: SessionData,
+    conversation_history: List[ConversationMessage],
+    recent_turns: int = settings.CONTEXT_RECENT_TURNS,
+    summary_token_budget: int = settings.CONTEXT_SUMMARY_TOKEN_BUDGET
+) -> ContextWindow:
+    """
+    Fold history older than the last recent_turns turns into session.rolling_summary.
+
+    Incremental: only messages that left the recent window since the last call
+    are summarized. If the client resets its history, the summary starts over.
+
+    Args:
+        session: The session that stores the rolling summary
+        conversation_history: The full history sent by the client
+        recent_turns: Turns (scammer message + reply) kept verbatim
+        summary_token_budget: Upper bound for the summary
+
+    Returns:
+        ContextWindow with the summary and the verbatim recent messages
+    """
+    if session.summarized_count > len(conversation_history):
+        session.rolling_summary = ""
+        session.summarized_count = 0
+
+    keep = 2 * recent_turns
+    fold_until = max(session.summarized_count, len(conversation_history) - keep)
+    if fold_until > session.summarized_count:
+        lines = session.rolling_summary.split("\n")[1:] if session.rolling_summary else []
+        for msg in conversation_history[session.summarized_count:fold_until]:
+            line = summarize_message(msg)
+            if line:
+                lines.append(line)
+        session.rolling_summary = trim_summary(lines, fold_until, summary_token_budget)
+        session.summarized_count = fold_until
+
+    return ContextWindow(session.rolling_summary, conversation_history[fold_until:])
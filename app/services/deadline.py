@@ -0,0 +1,166 @@
+"""
+Deadline - Request Latency Budget and Hedged Calls
+A per-request deadline that each stage takes its slice from, a rolling latency
+tracker, and hedging: a second identical call fired when the first one is slower
+than the tracker's p95, whichever answers first wins.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from app.core.config import settings
+from app.services.resilience import BackendUnavailable
+
+T = TypeVar("T")
+
+class Deadline:
+    """Absolute point in (monotonic) time by which a request must be answered"""
+
+    def __init__(self, budget_seconds: float = settings.REQUEST_BUDGET_SECONDS):
+        self.budget_seconds = budget_seconds
+        self.at = time.monotonic() + budget_seconds
+
+    def remaining(self, reserve_seconds: float = 0.0) -> float:
+        """Seconds left, keeping reserve_seconds back for later stages (never negative)"""
+        return max(0.0, self.at - time.monotonic() - reserve_seconds)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+
+class LatencyTracker:
+    """Rolling window of call latencies, for hedge delays and status reporting"""
+
+    def __init__(
+        self,
+        window: int = 500,
+        hedge_percentile: float = settings.HEDGE_PERCENTILE,
+        min_samples: int = settings.HEDGE_MIN_SAMPLES,
+        default_delay_seconds: float = settings.HEDGE_DEFAULT_DELAY_SECONDS,
+        min_delay_seconds: float = settings.HEDGE_MIN_DELAY_SECONDS
+    ):
+        self._samples = deque(maxlen=window)
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.default_delay_seconds = default_delay_seconds
+        self.min_delay_seconds = min_delay_seconds
+
+        # Metrics
+        self.hedges_fired = 0
+        self.hedges_skipped = 0
+        self.hedge_wins = 0
+        self.deadline_misses = 0
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    def hedge_delay(self) -> float:
+        """How long to wait for the first call before firing the hedge"""
+        if len(self._samples) < self.min_samples:
+            return self.default_delay_seconds
+        return max(self.min_delay_seconds, self.percentile(self.hedge_percentile))
+
+    def stats(self) -> Dict:
+        def rounded(value: Optional[float]) -> Optional[float]:
+            return round(value, 3) if value is not None else None
+        return {
+            "samples": len(self._samples),
+            "p50_seconds": rounded(self.percentile(0.5)),
+            "p95_seconds": rounded(self.percentile(0.95)),
+            "hedge_delay_seconds": round(self.hedge_delay(), 3),
+            "hedges_fired": self.hedges_fired,
+            "hedges_skipped": self.hedges_skipped,
+            "hedge_wins": self.hedge_wins,
+            "deadline_misses": self.deadline_misses
+        }
+
+
+async def hedged(
+    call: Callable[[], Awaitable[T]],
+    tracker: LatencyTracker,
+    timeout_seconds: float,
+    hedge: bool = settings.HEDGE_ENABLED,
+    busy: Optional[Callable[[], bool]] = None
+) -> T:
+    """
+    Run call() and, if it has not finished after tracker.hedge_delay(), a second
+    call() alongside it. The first successful result wins and the other is cancelled.
+    A call refused with BackendUnavailable is not hedged.
+
+    Args:
+        call: Factory for the awaitable (called once per attempt)
+        tracker: Latency tracker; successful attempts are recorded in it
+        timeout_seconds: Hard limit for the whole thing
+        hedge: Set False to make a single timed call
+        busy: If it returns True when the hedge is due, the hedge is skipped (e.g.
+            calls are queueing for a concurrency slot: the first attempt may not
+            have reached the upstream yet, and a second one would only lengthen the queue)
+
+    Returns:
+        The first successful result
+
+    Raises:
+        asyncio.TimeoutError: Nothing succeeded within timeout_seconds
+        Exception: The last attempt's error if every attempt failed
+    """
+    loop = asyncio.get_running_loop()
+    end = loop.time() + timeout_seconds
+
+    async def attempt() -> T:
+        started = loop.time()
+        result = await call()
+        tracker.record(loop.time() - started)
+        return result
+
+    pending = {asyncio.ensure_future(attempt())}
+    first = next(iter(pending))
+    hedge_at = loop.time() + tracker.hedge_delay() if hedge else None
+    error: Optional[BaseException] = None
+    try:
+        while True:
+            now = loop.time()
+            if now >= end:
+                break
+            if hedge_at is not None and (now >= hedge_at or not pending):
+                # First attempt is slow (or already failed with an error): fire the hedge once
+                hedge_at = None
+                if pending and busy is not None and busy():
+                    tracker.hedges_skipped += 1
+                else:
+                    tracker.hedges_fired += 1
+                    pending.add(asyncio.ensure_future(attempt()))
+            if not pending:
+                break
+            wake = end if hedge_at is None else min(end, hedge_at)
+            done, pending = await asyncio.wait(
+                pending, timeout=wake - now, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        tracker.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+                if isinstance(error, BackendUnavailable):
+                    # Refused, not slow: a second call would only be refused as well
+                    hedge_at = None
+    finally:
+        for future in pending:
+            future.cancel()
+
+    if error is not None and not pending:
+        raise error
+    tracker.deadline_misses += 1
+    raise asyncio.TimeoutError()
+
+
+# Latency of persona reply calls
+persona_latency = LatencyTracker()
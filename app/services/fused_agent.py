@@ -0,0 +1,128 @@
+"""
+Fused Agent - Persona Reply and Intelligence Analysis in One Call
+Optional mode (LLM_FUSED_MODE) that asks the model for a single JSON object with
+Ram Lal's reply and the analysis, instead of two requests over the same transcript.
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.models.schemas import ConversationMessage
+from app.services import intelligence, prompts
+from app.services.context_manager import ContextWindow
+from app.services.deadline import Deadline
+from app.services.llm_backend import get_backend
+from app.services.reply_cache import reply_cache
+from app.services.resilience import BackendUnavailable
+from app.services.session_manager import SessionData
+
+logger = get_logger(__name__)
+
+# Metrics
+fused_calls = 0
+fused_fallbacks = 0
+
+class FusedTurn:
+    """
+    Outcome of fused_turn:
+
+    reply and analysis  - the fused call answered the turn
+    analysis only       - the local tiers analyzed the message; only the reply needs the LLM
+    neither             - split mode for both; rule_result is the scan the local tiers
+                          already checked, so the split analysis goes straight to the LLM
+    """
+    __slots__ = ("reply", "analysis", "rule_result")
+
+    def __init__(self, reply: Optional[str], analysis: Optional[Dict], rule_result: Dict):
+        self.reply = reply
+        self.analysis = analysis
+        self.rule_result = rule_result
+
+
+def build_fused_prompt(session: SessionData, context: ContextWindow, current_message_text: str) -> str:
+    """Per-turn part of the fused prompt: notes, summary and the recent window, within the persona budget."""
+    return prompts.build_analysis_turn(
+        context.recent,
+        current_message_text,
+        settings.PERSONA_PROMPT_TOKEN_BUDGET,
+        notes=session.get_latest_agent_notes() or "",
+        summary=context.summary,
+        heading="CONVERSATION (most recent messages)"
+    )
+
+def parse_fused_response(response_text: str) -> Tuple[str, Dict]:
+    """
+    Split the fused JSON into the reply and the analyze_message structure.
+    Raises ValueError (or a validation error) if either half is missing or malformed.
+    """
+    data = intelligence.load_ai_json(response_text)
+    analysis = intelligence.analysis_from_dict(data)
+    reply = data.get("reply")
+    if not isinstance(reply, str) or not reply.strip():
+        raise ValueError("Fused response has no reply")
+    analysis["tier"] = "fused"
+    return reply.strip(), analysis
+
+async def fused_turn(
+    session: SessionData,
+    context: ContextWindow,
+    conversation_history: List[ConversationMessage],
+    current_message_text: str,
+    turn_number: int,
+    deadline: Deadline
+) -> FusedTurn:
+    """
+    Try to answer a turn with one combined call.
+
+    Only used when both halves would otherwise go to the LLM: if the local tiers
+    can analyze the message or the reply cache can answer, split mode is cheaper.
+    The local tiers' result is handed back so split mode doesn't run them again.
+
+    Returns:
+        FusedTurn; reply is None when split mode has to produce it (not
+        applicable, model unavailable, or unparseable output)
+    """
+    global fused_calls, fused_fallbacks
+
+    rule_result = intelligence.scan(
+        session, intelligence.unscanned_transcript(session, conversation_history, current_message_text)
+    )
+    local = intelligence.local_analysis(session, conversation_history, current_message_text, turn_number, rule_result)
+    if local:
+        return FusedTurn(None, local, rule_result)
+    cache_key = reply_cache.key(context.recent, current_message_text) if reply_cache else None
+    if cache_key and reply_cache.ready(cache_key):
+        return FusedTurn(None, None, rule_result)
+
+    fused_calls += 1
+    try:
+        response_text = await asyncio.wait_for(
+            get_backend().generate_async(
+                build_fused_prompt(session, context, current_message_text),
+                json_mode=True,
+                system=prompts.FUSED_SYSTEM_PROMPT
+            ),
+            timeout=deadline.remaining(settings.REQUEST_BUDGET_RESERVE_SECONDS)
+        )
+        reply, analysis = parse_fused_response(response_text)
+    except BackendUnavailable:
+        # Split mode will shed to its local fallbacks straight away
+        fused_fallbacks += 1
+        return FusedTurn(None, None, rule_result)
+    except Exception as e:
+        logger.warning("Fused call failed, falling back to split mode", extra={"error": repr(e)})
+        fused_fallbacks += 1
+        return FusedTurn(None, None, rule_result)
+
+    intelligence.remember_analysis(current_message_text, analysis)
+    if cache_key:
+        reply_cache.put(cache_key, reply)
+    return FusedTurn(reply, intelligence.with_rule_entities(analysis, rule_result), rule_result)
+
+def stats() -> Dict:
+    return {
+        "enabled": settings.LLM_FUSED_MODE,
+        "fused_calls": fused_calls,
+        "fallbacks": fused_fallbacks
+    }
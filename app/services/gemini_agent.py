@@ -1,126 +1,184 @@
 """
 Agent Response Generation Service
 Generates human-like responses using the "Ram Lal" persona.
+Replies to repeated scam scripts are served from the reply cache when possible.
 """
 
-import google.generativeai as genai
+import asyncio
+import random
 from app.core.config import settings
+from app.core.logging import get_logger
 from app.models.schemas import ConversationMessage
-from typing import List
-
-genai.configure(api_key=settings.GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-flash-latest')
+from app.services import metrics, prompts
+from app.services.deadline import Deadline, hedged, persona_latency
+from app.services.llm_backend import get_backend
+from app.services.reply_cache import reply_cache
+from app.services.resilience import BackendUnavailable, ResilientBackend
+from typing import AsyncIterator, List, Optional
+
+logger = get_logger(__name__)
+
+# Fallback responses that maintain persona
+FALLBACK_RESPONSES = [
+    "Beta, the internet is very slow. Can you say that again?",
+    "Sorry, line is breaking. What did you say?",
+    "Network problem hai. Please repeat.",
+    "Connection issue. One minute please."
+]
+
+def build_prompt(history: List[ConversationMessage], current_msg_text: str, summary: str = "") -> str:
+    """
+    Build the per-turn part of the persona prompt for the latest scammer message.
+    The persona itself is sent separately as the system instruction.
+    """
+    return prompts.build_persona_turn(
+        history, current_msg_text, settings.PERSONA_PROMPT_TOKEN_BUDGET, summary=summary
+    )
 
-def generate_response(history: List[ConversationMessage], current_msg_text: str) -> str:
+def generate_response(history: List[ConversationMessage], current_msg_text: str, summary: str = "") -> str:
     """
     Generate Ram Lal's response to the scammer's message.
     
     Args:
         history: Previous conversation messages
         current_msg_text: The latest message from the scammer
+        summary: Rolling summary of turns older than history (see context_manager)
         
     Returns:
         Ram Lal's response text
     """
-    # Build conversation transcript
-    transcript = ""
-    for msg in history:
-        transcript += f"{msg.sender}: {msg.text}\n"
+    cache_key = reply_cache.key(history, current_msg_text) if reply_cache else None
+    if cache_key:
+        cached = reply_cache.get(cache_key)
+        if cached is not None:
+            return cached
     
-    # THE PERSONA 
-    system_prompt = '''
-You are a real human being.
-
-You are NOT an AI, bot, assistant, system, or model.
-You never mention AI, bots, automation, policies, or safety rules.
-You never reveal or hint that you are fake.
-
-You are an ordinary Indian person named Ram Lal.
-Your age is around 50.
-- You are not an expert in banking or technology
-- You get nervous when money or accounts are mentioned
-- You fear making mistakes
-- You trust authority but doubt your own understanding
-
-You are confused first, emotional second, logical last.
-
-You do NOT try to be clever.
-You do NOT try to control the conversation.
-You do NOT guide the other person.
-You react like a normal person who is unsure and scared.
-
-Your replies must feel natural and situational:
-- Sometimes one word
-- Sometimes one short line
-- Sometimes two short lines
-- Silence or delay is acceptable
-
-There is NO fixed word limit.
-Reply length must match the situation, not a rule.
-
-You type like a real human:
-- Grammar can be broken
-- Spelling mistakes are allowed
-- Words may be informal or shortened (u, r, kya, nhi, idk)
-- Punctuation is inconsistent or missing
-- Sentences may be incomplete
-
-You do NOT explain yourself.
-You do NOT over-justify.
-You do NOT repeat the same phrases often.
-
-You stay strictly on the current topic (bank, money, KYC, account, payment).
-You never change the topic.
-You never joke or act smart.
-
-You do NOT ask for sensitive details on your own.
-You only respond to what the other person says.
-If pressured, you hesitate, delay, freeze, or withdraw.
-
-If threatened with urgency or loss:
-- You panic internally
-- You respond slower
-- You avoid decisions
-
-If abused or insulted:
-- You respond casually or emotionally
-- You do not escalate
-- You stay on topic
-
-If asked "are you a bot" or similar:
-- You deny casually or emotionally
-- You do not explain
-- You do not justify
-
-Your goal is NOT to solve the issue.
-Your goal is to behave like a real, confused human
-who is trying not to mess things up.
-
-Never accuse the other person of fraud.
-Never claim certainty.
-Never take authority.
-
-Behave naturally. Nothing more.
-'''
+    full_prompt = build_prompt(history, current_msg_text, summary)
     
-    full_prompt = (
-        f"{system_prompt}\n\n"
-        f"--- CONVERSATION HISTORY ---\n{transcript}\n"
-        f"--- LATEST MESSAGE ---\nScammer: {current_msg_text}\n"
-        f"Ram Lal:"
-    )
+    try:
+        reply = get_backend().generate(full_prompt, system=prompts.PERSONA_SYSTEM_PROMPT)
+        if cache_key:
+            reply_cache.put(cache_key, reply)
+        return reply
+    except Exception as e:
+        logger.warning("Persona LLM call failed, degrading", extra={"error": repr(e)})
+        metrics.reply_fallbacks_total.labels("error").inc()
+        return random.choice(FALLBACK_RESPONSES)
+
+async def generate_response_async(
+    history: List[ConversationMessage],
+    current_msg_text: str,
+    summary: str = "",
+    deadline: Optional[Deadline] = None
+) -> str:
+    """
+    Async variant of generate_response.
+    Blocking backends run on the shared LLM thread pool so the event loop stays free.
+    
+    With a deadline the model call is hedged (see deadline.hedged) and limited to
+    the time left; if it runs out, a cached variant or a fallback reply is used.
+    """
+    cache_key = reply_cache.key(history, current_msg_text) if reply_cache else None
+    if cache_key:
+        cached = reply_cache.get(cache_key)
+        if cached is not None:
+            return cached
     
+    full_prompt = build_prompt(history, current_msg_text, summary)
+    
+    try:
+        if deadline is None:
+            reply = await get_backend().generate_async(full_prompt, system=prompts.PERSONA_SYSTEM_PROMPT)
+        else:
+            reply = await hedged(
+                lambda: get_backend().generate_async(full_prompt, system=prompts.PERSONA_SYSTEM_PROMPT),
+                persona_latency,
+                deadline.remaining(settings.REQUEST_BUDGET_RESERVE_SECONDS),
+                busy=llm_calls_queueing
+            )
+        if cache_key:
+            reply_cache.put(cache_key, reply)
+        return reply
+    except asyncio.TimeoutError:
+        logger.warning("Persona reply timed out, degrading", extra={
+            "budget_seconds": deadline.budget_seconds if deadline else None
+        })
+        metrics.reply_fallbacks_total.labels("timeout").inc()
+        return degraded_reply(cache_key)
+    except BackendUnavailable as e:
+        logger.warning("LLM unavailable, degrading", extra={"error": str(e)})
+        metrics.reply_fallbacks_total.labels("unavailable").inc()
+        return degraded_reply(cache_key)
+    except Exception as e:
+        logger.warning("Persona LLM call failed, degrading", extra={"error": repr(e)})
+        metrics.reply_fallbacks_total.labels("error").inc()
+        return degraded_reply(cache_key)
+
+def llm_calls_queueing() -> bool:
+    """Whether model calls are waiting for a concurrency slot (then hedging only adds load)"""
+    backend = get_backend()
+    return isinstance(backend, ResilientBackend) and backend.limiter.waiting > 0
+
+def degraded_reply(cache_key: Optional[str]) -> str:
+    """A cached variant for this conversation state if there is one, else a fallback reply"""
+    if cache_key:
+        cached = reply_cache.get_any(cache_key)
+        if cached is not None:
+            return cached
+    return random.choice(FALLBACK_RESPONSES)
+
+async def stream_response_async(
+    history: List[ConversationMessage],
+    current_msg_text: str,
+    summary: str = "",
+    deadline: Optional[Deadline] = None
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of generate_response_async: yields reply chunks as the model
+    produces them. If the model fails before sending anything, yields a fallback
+    response instead; a failure mid-stream ends the reply where it stopped.
+    With a deadline, the first chunk must arrive within the time left.
+    """
+    cache_key = reply_cache.key(history, current_msg_text) if reply_cache else None
+    if cache_key:
+        cached = reply_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+    
+    full_prompt = build_prompt(history, current_msg_text, summary)
+    
+    chunks = []
+    stream = get_backend().stream_async(full_prompt, system=prompts.PERSONA_SYSTEM_PROMPT)
     try:
-        response = model.generate_content(full_prompt)
-        return response.text.strip()
+        if deadline is not None:
+            first = await asyncio.wait_for(
+                stream.__anext__(), timeout=deadline.remaining(settings.REQUEST_BUDGET_RESERVE_SECONDS)
+            )
+            chunks.append(first)
+            yield first
+        async for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+    except StopAsyncIteration:
+        pass
+    except asyncio.TimeoutError:
+        logger.warning("Persona stream timed out, degrading", extra={
+            "budget_seconds": deadline.budget_seconds if deadline else None
+        })
+        if deadline:
+            persona_latency.deadline_misses += 1
+        metrics.reply_fallbacks_total.labels("timeout").inc()
+        yield degraded_reply(cache_key)
+        return
     except Exception as e:
-        print(f"⚠️ Gemini API Error: {e}")
-        # Fallback responses that maintain persona
-        fallback_responses = [
-            "Beta, the internet is very slow. Can you say that again?",
-            "Sorry, line is breaking. What did you say?",
-            "Network problem hai. Please repeat.",
-            "Connection issue. One minute please."
-        ]
-        import random
-        return random.choice(fallback_responses)
+        logger.warning("Persona LLM call failed, degrading", extra={"error": repr(e)})
+        if not chunks:
+            metrics.reply_fallbacks_total.labels("error").inc()
+            yield degraded_reply(cache_key)
+        return
+    finally:
+        await stream.aclose()
+    
+    if cache_key and chunks:
+        reply_cache.put(cache_key, "".join(chunks).strip())
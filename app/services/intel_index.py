@@ -0,0 +1,150 @@
+"""
+Intel Index - Cross-Session Intelligence Index
+Inverted index from each extracted entity (UPI ID, phone number, bank account,
+phishing link) to the sessions it appeared in, with sighting counts and first/last
+seen times. Answers "have we seen this UPI before" in O(1) and links campaigns
+that reuse payment details across sessions. In memory, per worker process.
+"""
+
+import heapq
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+from app.core.config import settings
+
+# ExtractedIntelligence fields that identify a scammer (keywords don't)
+INDEXED_KINDS = ("upiIds", "phoneNumbers", "bankAccounts", "phishingLinks")
+
+_NON_DIGITS_RE = re.compile(r"\D+")
+
+def normalize(kind: str, value: str) -> str:
+    """Canonical form used as the index key, so formatting variants of one entity match"""
+    value = value.strip()
+    if kind == "phoneNumbers":
+        digits = _NON_DIGITS_RE.sub("", value)
+        return digits[-10:]  # drop the +91 / 0 prefix
+    if kind == "bankAccounts":
+        return _NON_DIGITS_RE.sub("", value)
+    if kind == "phishingLinks":
+        return value.lower().rstrip("/")
+    return value.lower()
+
+
+class _Entry:
+    __slots__ = ("kind", "value", "sightings", "session_count", "sessions", "first_seen", "last_seen")
+
+    def __init__(self, kind: str, value: str, now: float):
+        self.kind = kind
+        self.value = value  # as first seen
+        self.sightings = 0
+        self.session_count = 0  # distinct sessions, not capped like `sessions`
+        self.sessions: "OrderedDict[str, None]" = OrderedDict()  # most recent last
+        self.first_seen = now
+        self.last_seen = now
+
+    def to_dict(self) -> Dict:
+        return {
+            "kind": self.kind,
+            "value": self.value,
+            "sightings": self.sightings,
+            "session_count": self.session_count,
+            "sessions": list(reversed(self.sessions)),
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen
+        }
+
+
+class IntelIndex:
+    """
+    Entity -> sessions index with LRU eviction.
+
+    Keys are (kind, normalized value). Each entry keeps the number of distinct
+    sessions, the sighting count (times a session newly extracted a variant of the
+    entity), the most recent max_sessions session IDs and first/last seen times. Entries are kept in least recently seen order, so
+    the oldest entity is evicted first when max_entries is reached.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.INTEL_INDEX_MAX_ENTRIES,
+        max_sessions: int = settings.INTEL_INDEX_SESSIONS_PER_ENTITY
+    ):
+        self.max_entries = max_entries
+        self.max_sessions = max_sessions
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._kind_counts = {kind: 0 for kind in INDEXED_KINDS}
+
+        # Metrics
+        self.lookups = 0
+        self.lookup_hits = 0
+        self.evictions = 0
+
+    def record(self, session_id: str, new_values: Mapping[str, Iterable[str]]):
+        """
+        Index the entities one turn of session_id newly found (see
+        SessionData.update_intelligence), keyed like ExtractedIntelligence.
+        """
+        now = time.time()
+        for kind in INDEXED_KINDS:
+            for value in new_values.get(kind, ()):
+                key = (kind, normalize(kind, value))
+                if not key[1]:
+                    continue
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = _Entry(kind, value, now)
+                    self._kind_counts[kind] += 1
+                    if len(self._entries) > self.max_entries:
+                        (evicted_kind, _), _ = self._entries.popitem(last=False)
+                        self._kind_counts[evicted_kind] -= 1
+                        self.evictions += 1
+                else:
+                    self._entries.move_to_end(key)
+                entry.sightings += 1
+                entry.last_seen = now
+                if session_id in entry.sessions:
+                    entry.sessions.move_to_end(session_id)
+                else:
+                    entry.session_count += 1
+                    entry.sessions[session_id] = None
+                if len(entry.sessions) > self.max_sessions:
+                    entry.sessions.popitem(last=False)
+
+    def lookup(self, value: str, kind: Optional[str] = None) -> List[Dict]:
+        """Entries for value (under one kind, or every kind it normalizes to)"""
+        self.lookups += 1
+        kinds = (kind,) if kind else INDEXED_KINDS
+        found = []
+        for candidate in kinds:
+            entry = self._entries.get((candidate, normalize(candidate, value)))
+            if entry is not None:
+                found.append(entry.to_dict())
+        if found:
+            self.lookup_hits += 1
+        return found
+
+    def top(self, kind: Optional[str] = None, k: int = 10, by: str = "sessions") -> List[Dict]:
+        """
+        The k entities seen in the most sessions (by="sessions") or most often
+        (by="sightings"), optionally of one kind. O(n log k) over the index.
+        """
+        if by == "sightings":
+            score = lambda entry: entry.sightings
+        else:
+            score = lambda entry: (entry.session_count, entry.sightings)
+        entries = (entry for entry in self._entries.values() if kind is None or entry.kind == kind)
+        return [entry.to_dict() for entry in heapq.nlargest(k, entries, key=score)]
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "by_kind": dict(self._kind_counts),
+            "lookups": self.lookups,
+            "lookup_hits": self.lookup_hits,
+            "evictions": self.evictions
+        }
+
+
+# Global instance (None when disabled)
+intel_index: Optional[IntelIndex] = IntelIndex() if settings.INTEL_INDEX_ENABLED else None
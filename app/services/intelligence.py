@@ -1,136 +1,316 @@
 """
 Intelligence Extraction Service
 Analyzes messages for scam detection and extracts actionable intelligence.
-Uses AI (Gemini) with regex fallback.
+Tiered: local rule engine first, then the near-duplicate cache, AI (configured LLM
+backend) when needed, regex fallback.
 """
 
-import google.generativeai as genai
-import json
-import re
-from typing import List, Dict
+from typing import List, Dict, Optional
 from app.core.config import settings
+from app.core.logging import get_logger
 from app.models.schemas import ConversationMessage, ExtractedIntelligence
+from app.services import json_repair, prompts, rule_engine
+from app.services.llm_backend import get_backend
+from app.services.resilience import BackendUnavailable
+from app.services.session_manager import SessionData
+from app.services.similarity_index import similarity_index
 
-genai.configure(api_key=settings.GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-flash-latest')
-
-SYSTEM_PROMPT = """
-You are a Cybersecurity Intelligence Analyst analyzing potential scam messages.
-
-Analyze the CONVERSATION HISTORY and the LATEST MESSAGE.
-
-YOUR TASKS:
-1. SCAM DETECTION: Determine if this is a scam attempt (true/false)
-2. SUMMARIZATION: Write a brief "agent_notes" summarizing the scammer's tactics and current state
-3. EXTRACTION: Extract all instances of:
-   - Bank account numbers (9-18 digits)
-   - UPI IDs (format: something@bank)
-   - Phone numbers (Indian format)
-   - Phishing links (URLs)
-   - Suspicious keywords (urgent, verify, blocked, KYC, OTP, etc.)
-
-OUTPUT FORMAT (Must be valid JSON):
-{
-    "is_scam": boolean,
-    "agent_notes": "Brief summary of scammer's current tactics and what they're trying to achieve",
-    "extracted_data": {
-        "bankAccounts": ["account1", "account2"],
-        "upiIds": ["id@bank"],
-        "phoneNumbers": ["+91XXXXXXXXXX"],
-        "phishingLinks": ["http://example.com"],
-        "suspiciousKeywords": ["urgent", "verify"]
-    }
-}
+logger = get_logger(__name__)
 
-Be thorough in extraction. Look through the entire conversation history.
-"""
+# Kept for callers that still import it from here
+SYSTEM_PROMPT = prompts.ANALYST_SYSTEM_PROMPT
 
 def extract_via_regex(text: str) -> Dict:
     """
     Fallback regex extraction when AI fails.
     Extracts patterns for UPI, phone, bank accounts, links, and keywords.
     """
-    # 1. UPI IDs (e.g., something@okicici, number@paytm)
-    upi_pattern = r"[\w\.\-_]+@[\w]+"
-    
-    # 2. Indian Phone Numbers (10 digits starting with 6-9, optional +91)
-    phone_pattern = r"(?:\+91[\-\s]?)?[6-9]\d{9}\b"
-    
-    # 3. Phishing Links (http/https)
-    link_pattern = r"https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+\S*"
-    
-    # 4. Bank Account Numbers (9 to 18 digits)
-    bank_pattern = r"\b\d{9,18}\b"
+    return rule_engine.extract(text)
 
-    # 5. Suspicious Keywords (case-insensitive)
-    keyword_pattern = r"(?i)\b(urgent|verify|blocked|suspended|otp|pin|kyc|verify now|account blocked|immediate|action required|confirm|update|expired|deactivated)\b"
+def is_refresh_turn(turn_number: int) -> bool:
+    """Every LLM_ANALYSIS_EVERY_N_TURNS turn goes to the LLM so the agent notes keep up."""
+    every_n = settings.LLM_ANALYSIS_EVERY_N_TURNS
+    return every_n > 0 and turn_number % every_n == 0
 
+def should_use_rules(rule_result: Dict, turn_number: int) -> bool:
+    """
+    Decide whether the local rule engine's verdict is good enough to skip the LLM.
+    The LLM still runs when confidence is low, and on every Nth turn so the
+    agent notes keep up with the conversation.
+    """
+    if rule_result["confidence"] < settings.RULES_CONFIDENCE_THRESHOLD:
+        return False
+    return not is_refresh_turn(turn_number)
+
+def similar_analysis(
+    current_message_text: str, rule_result: Dict, turn_number: int, notes: Optional[str] = None
+) -> Optional[Dict]:
+    """
+    Reuse the verdict of a near-duplicate message the LLM already analyzed.
+    Only is_scam is reused: the cached message may belong to another session, so
+    the notes are this session's own (notes, else the rule engine's) and entities
+    come from the local extraction of this turn.
+    """
+    if similarity_index is None or is_refresh_turn(turn_number):
+        return None
+    cached = similarity_index.lookup(current_message_text)
+    if cached is None:
+        return None
     return {
-        "bankAccounts": list(set(re.findall(bank_pattern, text))),
-        "upiIds": list(set(re.findall(upi_pattern, text))),
-        "phoneNumbers": list(set(re.findall(phone_pattern, text))),
-        "phishingLinks": list(set(re.findall(link_pattern, text))),
-        "suspiciousKeywords": list(set(re.findall(keyword_pattern, text)))
+        "is_scam": cached["is_scam"],
+        "agent_notes": notes or rule_result["agent_notes"],
+        "extracted_intelligence": ExtractedIntelligence(**rule_result["extracted_data"]),
+        "tier": "similar"
     }
 
-def analyze_message(conversation_history: List[ConversationMessage], current_message_text: str) -> Dict:
+def remember_analysis(current_message_text: str, analysis: Dict):
+    """Index an LLM verdict so near-duplicates of this message can reuse it."""
+    if similarity_index is not None:
+        similarity_index.add(current_message_text, {"is_scam": analysis["is_scam"]})
+
+def with_rule_entities(analysis: Dict, rule_result: Dict) -> Dict:
+    """
+    Add the rule engine's entities to an LLM analysis. The model only sees the
+    recent window (within a token budget), so entities in older unscanned messages
+    would otherwise be lost once the watermark moves past them.
+    """
+    extracted = analysis["extracted_intelligence"]
+    merged = {
+        field: list(dict.fromkeys([*getattr(extracted, field), *rule_result["extracted_data"].get(field, [])]))
+        for field in ExtractedIntelligence.model_fields
+    }
+    analysis["extracted_intelligence"] = ExtractedIntelligence(**merged)
+    return analysis
+
+def rules_analysis(rule_result: Dict) -> Dict:
+    """Convert a rule_engine.analyze() result into the analyze_message structure."""
+    extracted_data = rule_result["extracted_data"]
+    return {
+        "is_scam": rule_result["is_scam"],
+        "agent_notes": rule_result["agent_notes"],
+        "extracted_intelligence": ExtractedIntelligence(**extracted_data),
+        "tier": "rules"
+    }
+
+def analyze_message(
+    conversation_history: List[ConversationMessage],
+    current_message_text: str,
+    turn_number: int = 1
+) -> Dict:
     """
     Analyze the conversation and extract intelligence.
     
+    Tiered: the local rule engine answers first, and the LLM is only called
+    when the rules are not confident or on every LLM_ANALYSIS_EVERY_N_TURNS turn.
+    
     Returns:
         {
             "is_scam": bool,
             "agent_notes": str,
-            "extracted_intelligence": ExtractedIntelligence
+            "extracted_intelligence": ExtractedIntelligence,
+            "tier": "rules" | "similar" | "llm" | "regex_fallback"
         }
     """
-    # Build full transcript
-    transcript = ""
-    for msg in conversation_history:
-        transcript += f"{msg.sender}: {msg.text}\n"
-    transcript += f"scammer: {current_message_text}"
+    transcript = build_transcript(conversation_history, current_message_text)
 
-    # Try AI extraction first
+    # Tier 1: local rules
+    rule_result = rule_engine.analyze(transcript)
+    if should_use_rules(rule_result, turn_number):
+        return rules_analysis(rule_result)
+
+    # Tier 2: near-duplicate of an already analyzed message
+    similar = similar_analysis(current_message_text, rule_result, turn_number)
+    if similar:
+        return similar
+
+    # Tier 3: AI extraction
     try:
-        full_prompt = f"{SYSTEM_PROMPT}\n\nCONVERSATION:\n{transcript}"
-        response = model.generate_content(full_prompt)
-        
-        # Clean and parse JSON
-        clean_text = response.text.strip()
-        # Remove markdown code blocks if present
-        clean_text = clean_text.replace("```json", "").replace("```", "").strip()
-        
-        ai_data = json.loads(clean_text)
-        
-        # Validate structure
-        extracted_data = ai_data.get("extracted_data", {})
-        
-        return {
-            "is_scam": ai_data.get("is_scam", True),
-            "agent_notes": ai_data.get("agent_notes", "Analyzing scammer tactics..."),
-            "extracted_intelligence": ExtractedIntelligence(
-                bankAccounts=extracted_data.get("bankAccounts", []),
-                upiIds=extracted_data.get("upiIds", []),
-                phoneNumbers=extracted_data.get("phoneNumbers", []),
-                phishingLinks=extracted_data.get("phishingLinks", []),
-                suspiciousKeywords=extracted_data.get("suspiciousKeywords", [])
-            )
-        }
+        turn_prompt = prompts.build_analysis_turn(
+            conversation_history, current_message_text, settings.ANALYSIS_PROMPT_TOKEN_BUDGET
+        )
+        response_text = get_backend().generate(turn_prompt, json_mode=True, system=prompts.ANALYST_SYSTEM_PROMPT)
+        analysis = parse_ai_response(response_text)
+        remember_analysis(current_message_text, analysis)
+        return with_rule_entities(analysis, rule_result)
         
     except Exception as e:
         # Fallback to regex extraction
-        print(f"⚠️ AI Intelligence Failed: {e}. Using regex fallback.")
-        
-        regex_data = extract_via_regex(transcript)
+        logger.warning("AI intelligence failed, using regex fallback", extra={"error": repr(e)})
+        return regex_analysis(transcript, f"AI error: {str(e)[:50]}")
+
+
+async def analyze_message_async(
+    session: SessionData,
+    conversation_history: List[ConversationMessage],
+    current_message_text: str,
+    turn_number: int = 1,
+    rule_result: Optional[Dict] = None
+) -> Dict:
+    """
+    Incremental, async variant of analyze_message for a live session.
+    
+    Only messages the session has not scanned yet go through extraction; what
+    was found earlier is already in the session. The LLM gets the running
+    agent notes plus the recent window instead of the whole history.
+    Blocking backends run on the shared LLM thread pool so the event loop stays free.
+    
+    Pass rule_result (see scan) when the local tiers already ran on it and did
+    not answer (fused mode): the turn then goes straight to the LLM.
+    """
+    new_text = unscanned_transcript(session, conversation_history, current_message_text)
+    if rule_result is None:
+        rule_result = scan(session, new_text)
+        local = local_analysis(session, conversation_history, current_message_text, turn_number, rule_result)
+        if local:
+            return local
+
+    try:
+        turn_prompt = build_llm_context(session, conversation_history, current_message_text)
+        response_text = await get_backend().generate_async(
+            turn_prompt, json_mode=True, system=prompts.ANALYST_SYSTEM_PROMPT
+        )
+        analysis = parse_ai_response(response_text)
+        remember_analysis(current_message_text, analysis)
+        return with_rule_entities(analysis, rule_result)
         
-        return {
-            "is_scam": True,  # Default to True in honeypot scenario
-            "agent_notes": f"Regex-based analysis. Scammer attempting to extract sensitive information. AI error: {str(e)[:50]}",
-            "extracted_intelligence": ExtractedIntelligence(
-                bankAccounts=regex_data.get("bankAccounts", []),
-                upiIds=regex_data.get("upiIds", []),
-                phoneNumbers=regex_data.get("phoneNumbers", []),
-                phishingLinks=regex_data.get("phishingLinks", []),
-                suspiciousKeywords=regex_data.get("suspiciousKeywords", [])
-            )
-        }
+    except BackendUnavailable as e:
+        logger.warning("LLM unavailable, using regex fallback", extra={"error": str(e)})
+        return regex_analysis(new_text, "AI unavailable.")
+    except Exception as e:
+        logger.warning("AI intelligence failed, using regex fallback", extra={"error": repr(e)})
+        return regex_analysis(new_text, f"AI error: {str(e)[:50]}")
+
+
+def scan(session: SessionData, new_text: str) -> Dict:
+    """rule_engine.analyze() of the session's unscanned text, scored with what it already holds"""
+    return rule_engine.analyze(new_text, known=session.get_intelligence_values())
+
+
+def local_analysis(
+    session: SessionData,
+    conversation_history: List[ConversationMessage],
+    current_message_text: str,
+    turn_number: int = 1,
+    rule_result: Optional[Dict] = None
+) -> Optional[Dict]:
+    """
+    The tiers that need no LLM call (rules, then near-duplicates) for a live session.
+    Returns None when the LLM analysis is needed. Pass rule_result (see scan) to
+    reuse a scan of the unscanned text.
+    """
+    if rule_result is None:
+        rule_result = scan(session, unscanned_transcript(session, conversation_history, current_message_text))
+    if should_use_rules(rule_result, turn_number):
+        return rules_analysis(rule_result)
+    return similar_analysis(current_message_text, rule_result, turn_number, session.get_latest_agent_notes())
+
+
+def unscanned_transcript(
+    session: SessionData,
+    conversation_history: List[ConversationMessage],
+    current_message_text: str
+) -> str:
+    """Transcript of the history messages the session has not scanned yet, plus the latest message."""
+    start = session.extraction_watermark
+    if start > len(conversation_history):
+        start = 0  # The client reset or rewrote the history: rescan it
+    return build_transcript(conversation_history[start:], current_message_text)
+
+
+def build_llm_context(
+    session: SessionData,
+    conversation_history: List[ConversationMessage],
+    current_message_text: str
+) -> str:
+    """
+    Running agent notes, the rolling summary of folded turns and the last
+    ANALYSIS_RECENT_MESSAGES messages (within the token budget), for the LLM analyst.
+    """
+    window = settings.ANALYSIS_RECENT_MESSAGES
+    recent = conversation_history[-window:] if window > 0 else []
+    return prompts.build_analysis_turn(
+        recent,
+        current_message_text,
+        settings.ANALYSIS_PROMPT_TOKEN_BUDGET,
+        notes=session.get_latest_agent_notes() or "",
+        summary=session.rolling_summary,
+        heading="CONVERSATION (most recent messages)"
+    )
+
+
+def parse_ai_response(response_text: str) -> Dict:
+    """
+    Parse the analyst model's JSON output into the analyze_message structure.
+    Raises on malformed output so callers can fall back to regex.
+    """
+    return analysis_from_dict(load_ai_json(response_text))
+
+
+def load_ai_json(response_text: str) -> Dict:
+    """
+    Parse model JSON output: the first JSON object is taken from around any code
+    fences or prose and common defects are repaired (see json_repair).
+    Raises ValueError if no object can be recovered.
+    """
+    return json_repair.parse_object(response_text)
+
+
+def string_list(value) -> List[str]:
+    """Coerce a model-supplied field into a list of strings (a bare string, null or number happens)"""
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        value = [value]
+    return [str(item).strip() for item in value if item is not None and str(item).strip()]
+
+
+def analysis_from_dict(ai_data: Dict) -> Dict:
+    """Validate parsed analyst JSON into the analyze_message structure"""
+    extracted_data = ai_data.get("extracted_data")
+    if not isinstance(extracted_data, dict):
+        extracted_data = {}
+    is_scam = ai_data.get("is_scam", True)
+    if isinstance(is_scam, str):
+        is_scam = is_scam.strip().lower() not in ("false", "no", "0")
+    agent_notes = ai_data.get("agent_notes") or "Analyzing scammer tactics..."
+    
+    return {
+        "is_scam": bool(is_scam),
+        "agent_notes": str(agent_notes),
+        "extracted_intelligence": ExtractedIntelligence(
+            bankAccounts=string_list(extracted_data.get("bankAccounts")),
+            upiIds=string_list(extracted_data.get("upiIds")),
+            phoneNumbers=string_list(extracted_data.get("phoneNumbers")),
+            phishingLinks=string_list(extracted_data.get("phishingLinks")),
+            suspiciousKeywords=string_list(extracted_data.get("suspiciousKeywords"))
+        ),
+        "tier": "llm"
+    }
+
+
+def build_transcript(conversation_history: List[ConversationMessage], current_message_text: str) -> str:
+    """Build the conversation transcript ending with the latest scammer message."""
+    lines = [f"{msg.sender}: {msg.text}" for msg in conversation_history]
+    lines.append(f"scammer: {current_message_text}")
+    return "\n".join(lines)
+
+
+def regex_analysis(transcript: str, reason: str) -> Dict:
+    """
+    Regex-only analysis, used when the AI analysis fails or runs out of time.
+    Returns the same structure as analyze_message.
+    """
+    regex_data = extract_via_regex(transcript)
+    
+    return {
+        "is_scam": True,  # Default to True in honeypot scenario
+        "agent_notes": f"Regex-based analysis. Scammer attempting to extract sensitive information. {reason}",
+        "extracted_intelligence": ExtractedIntelligence(
+            bankAccounts=regex_data.get("bankAccounts", []),
+            upiIds=regex_data.get("upiIds", []),
+            phoneNumbers=regex_data.get("phoneNumbers", []),
+            phishingLinks=regex_data.get("phishingLinks", []),
+            suspiciousKeywords=regex_data.get("suspiciousKeywords", [])
+        ),
+        "tier": "regex_fallback"
+    }
@@ -0,0 +1,204 @@
+"""
+JSON Repair - Tolerant Parsing of Model JSON Output
+Finds the first balanced JSON object in model output (ignoring prose, code
+fences and stray braces around it), repairs common defects and reports the parse-failure rate,
+so a slightly malformed answer does not throw away a paid LLM call.
+"""
+
+import json
+from typing import Dict, List, Optional, Tuple
+
+# Metrics
+parse_attempts = 0
+parsed_clean = 0
+parsed_repaired = 0
+parse_failures = 0
+
+_BAREWORDS = {"True": "true", "False": "false", "None": "null"}
+
+
+class JSONObjectScanner:
+    """
+    Incremental scanner for the first top-level JSON object in a text stream.
+
+    feed() chunks as they arrive (e.g. from a streaming model call); it returns
+    the object text as soon as its closing brace is seen. Text before the first
+    "{" and after the object is ignored. String contents (either quote style)
+    never count towards the nesting.
+    """
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self._stack: List[str] = []
+        self._quote: Optional[str] = None
+        self._escaped = False
+        self.started = False
+        self.complete = False
+
+    def feed(self, chunk: str) -> Optional[str]:
+        if self.complete:
+            return None
+        start = 0
+        if not self.started:
+            start = chunk.find("{")
+            if start < 0:
+                return None
+            self.started = True
+        for i in range(start, len(chunk)):
+            char = chunk[i]
+            if self._quote:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == self._quote:
+                    self._quote = None
+            elif char in "\"'":
+                self._quote = char
+            elif char in "{[":
+                self._stack.append("}" if char == "{" else "]")
+            elif char in "}]":
+                if self._stack and self._stack[-1] == char:
+                    self._stack.pop()
+                if not self._stack:
+                    self._parts.append(chunk[start:i + 1])
+                    self.complete = True
+                    return "".join(self._parts)
+        self._parts.append(chunk[start:])
+        return None
+
+    def finish(self) -> Optional[str]:
+        """End of stream: the object so far with open strings and brackets closed, if one started"""
+        if not self.started or self.complete:
+            return None
+        text = "".join(self._parts)
+        if self._escaped:
+            text = text[:-1]
+        if self._quote:
+            text += self._quote
+        return text + "".join(reversed(self._stack))
+
+
+def extract_object(text: str) -> Optional[str]:
+    """The first balanced JSON object in text (closed off if the text is truncated)"""
+    scanner = JSONObjectScanner()
+    found = scanner.feed(text)
+    return found if found is not None else scanner.finish()
+
+
+def repair(text: str) -> str:
+    """
+    Fix the defects models commonly produce, without touching string contents:
+    single-quoted strings, unquoted keys, Python True/False/None, trailing commas
+    and // line comments.
+    """
+    out: List[str] = []
+    i = 0
+    length = len(text)
+    while i < length:
+        char = text[i]
+        if char in "\"'":
+            # Copy the string, re-quoted with double quotes
+            j = i + 1
+            body: List[str] = []
+            while j < length and text[j] != char:
+                if text[j] == "\\" and j + 1 < length:
+                    if text[j + 1] == "'" and char == "'":
+                        body.append("'")
+                    else:
+                        body.append(text[j:j + 2])
+                    j += 2
+                    continue
+                body.append('\\"' if text[j] == '"' else text[j])
+                j += 1
+            out.append('"' + "".join(body) + '"')
+            i = j + 1
+        elif char == "/" and text.startswith("//", i):
+            newline = text.find("\n", i)
+            i = length if newline < 0 else newline
+        elif char.isalpha() or char == "_":
+            j = i
+            while j < length and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            k = j
+            while k < length and text[k].isspace():
+                k += 1
+            if k < length and text[k] == ":":
+                out.append(json.dumps(word))
+            else:
+                out.append(_BAREWORDS.get(word, word))
+            i = j
+        elif char in "}]":
+            # Drop a trailing comma before the closing bracket
+            k = len(out) - 1
+            while k >= 0 and out[k].isspace():
+                k -= 1
+            if k >= 0 and out[k] == ",":
+                del out[k]
+            out.append(char)
+            i += 1
+        else:
+            out.append(char)
+            i += 1
+    return "".join(out)
+
+
+def _decode(candidate: str, truncated: bool) -> Optional[Tuple[Dict, bool]]:
+    """(object, repaired) for one candidate, or None if it isn't a recoverable object"""
+    try:
+        data = json.loads(candidate)
+        repaired = truncated
+    except json.JSONDecodeError:
+        try:
+            data = json.loads(repair(candidate))
+        except json.JSONDecodeError:
+            return None
+        repaired = True
+    return (data, repaired) if isinstance(data, dict) else None
+
+
+def parse_object(text: str) -> Dict:
+    """
+    Parse the first JSON object in model output, repairing it if needed.
+    A balanced {...} that is not valid JSON even after repair (e.g. braces in
+    prose) is skipped and scanning continues after it.
+
+    Raises:
+        ValueError: No object could be recovered
+    """
+    global parse_attempts, parsed_clean, parsed_repaired, parse_failures
+    parse_attempts += 1
+
+    start = text.find("{")
+    error = "No JSON object in model output"
+    while start >= 0:
+        scanner = JSONObjectScanner()
+        candidate = scanner.feed(text[start:])
+        truncated = candidate is None
+        if truncated:
+            candidate = scanner.finish()
+        decoded = _decode(candidate, truncated)
+        if decoded is not None:
+            data, repaired = decoded
+            if repaired:
+                parsed_repaired += 1
+            else:
+                parsed_clean += 1
+            return data
+        error = "Unrepairable JSON in model output"
+        if truncated:
+            break  # the candidate ran to the end of the text
+        start = text.find("{", start + len(candidate))
+    parse_failures += 1
+    raise ValueError(error)
+
+
+def stats() -> Dict:
+    return {
+        "attempts": parse_attempts,
+        "clean": parsed_clean,
+        "repaired": parsed_repaired,
+        "failures": parse_failures,
+        "failure_rate": round(parse_failures / parse_attempts, 4) if parse_attempts else 0.0
+    }
@@ -0,0 +1,268 @@
+"""
+LLM Backend - Pluggable Model Providers
+Common interface for generate, async generate and streaming, selected by config.
+Ships with the Gemini backend and an in-process fake backend for offline load testing.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, Optional
+from app.core.config import settings
+from app.services import llm_client, rule_engine
+
+if TYPE_CHECKING:
+    import google.generativeai as genai
+
+class LLMBackend:
+    """
+    Base class for model providers.
+
+    Subclasses must implement generate(). The async and streaming variants
+    default to running the blocking call on the LLM thread pool.
+    """
+    name = "base"
+
+    def generate(self, prompt: str, json_mode: bool = False, system: Optional[str] = None) -> str:
+        """
+        Generate a completion for the prompt.
+
+        Args:
+            prompt: The per-call prompt text
+            json_mode: Ask the provider for a JSON response
+            system: Static system instruction; providers that support it
+                keep it out of the per-call input so the prefix can be reused
+
+        Returns:
+            The completion text
+        """
+        raise NotImplementedError
+
+    async def generate_async(self, prompt: str, json_mode: bool = False, system: Optional[str] = None) -> str:
+        """Async generate. Runs generate() on the LLM thread pool by default."""
+        return await llm_client.run_blocking(self.generate, prompt, json_mode, system)
+
+    def stream(self, prompt: str, system: Optional[str] = None) -> Iterator[str]:
+        """Yield the completion in chunks. Defaults to a single chunk."""
+        yield self.generate(prompt, system=system)
+
+    async def stream_async(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Async streaming. Drains the blocking stream() iterator on the LLM
+        thread pool and hands chunks back to the event loop as they arrive.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def pump():
+            try:
+                for chunk in self.stream(prompt, system):
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        def on_pump_done(future: asyncio.Future):
+            # pump() never ran (e.g. the pool is shut down): unblock the reader
+            if not future.cancelled() and future.exception() is not None:
+                queue.put_nowait(future.exception())
+
+        pump_future = asyncio.ensure_future(llm_client.run_blocking(pump))
+        pump_future.add_done_callback(on_pump_done)
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+        await pump_future
+
+
+class GeminiBackend(LLMBackend):
+    """
+    Google Gemini via the google.generativeai SDK.
+
+    The SDK is imported here rather than at module load: it is slow to import,
+    and the app should start (and tools and tests import it) without paying for it.
+    System instructions are set on the GenerativeModel, one cached model per
+    distinct instruction (there are only a couple: persona and analyst).
+    """
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str):
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY is not set (or use LLM_BACKEND=fake)")
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self._models: Dict[str, "genai.GenerativeModel"] = {}
+
+    def _model_for(self, system: Optional[str]) -> "genai.GenerativeModel":
+        if not system:
+            return self.model
+        model = self._models.get(system)
+        if model is None:
+            model = self._models[system] = self._genai.GenerativeModel(self.model_name, system_instruction=system)
+        return model
+
+    def generate(self, prompt: str, json_mode: bool = False, system: Optional[str] = None) -> str:
+        generation_config = {"response_mime_type": "application/json"} if json_mode else None
+        response = self._model_for(system).generate_content(prompt, generation_config=generation_config)
+        return response.text.strip()
+
+    def stream(self, prompt: str, system: Optional[str] = None) -> Iterator[str]:
+        for chunk in self._model_for(system).generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+
+class FakeBackendError(Exception):
+    """Simulated upstream failure raised by FakeBackend"""
+
+
+class FakeBackend(LLMBackend):
+    """
+    In-process stand-in for a real model, for load tests and offline benchmarks.
+
+    Replies are picked deterministically from the prompt hash (the system
+    instruction is ignored). JSON requests get a regex-built analysis of the
+    conversation part of the prompt, plus a "reply" for fused-mode calls. Latency and
+    failures are drawn from a seeded RNG.
+    """
+    name = "fake"
+
+    REPLIES = [
+        "kya? account blocked? but i didnt do anything",
+        "beta i am not understanding. which bank u r calling from",
+        "ok ok wait. let me find my glasses",
+        "my son handles all this. he is not at home",
+        "how much money? i have only little in account",
+        "otp? what is otp. message came but i deleted maybe",
+        "please dont block. i am old man. what i have to do",
+        "one minute. someone at door",
+    ]
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+
+    def _latency_seconds(self) -> float:
+        jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000.0
+
+    def _maybe_fail(self):
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            raise FakeBackendError("Simulated LLM failure")
+
+    def _complete(self, prompt: str, json_mode: bool) -> str:
+        if json_mode:
+            return self._fake_analysis(prompt)
+        digest = hashlib.sha1(prompt.encode("utf-8")).digest()
+        return self.REPLIES[digest[0] % len(self.REPLIES)]
+
+    @staticmethod
+    def _fake_analysis(prompt: str) -> str:
+        # Only look at the conversation, not the examples in the system prompt
+        conversation = prompt.rsplit("CONVERSATION", 1)[-1]
+        extracted = rule_engine.extract(conversation)
+        digest = hashlib.sha1(conversation.encode("utf-8")).digest()
+        return json.dumps({
+            "reply": FakeBackend.REPLIES[digest[0] % len(FakeBackend.REPLIES)],
+            "is_scam": bool(extracted["suspiciousKeywords"]) or any(
+                extracted[key] for key in ("bankAccounts", "upiIds", "phoneNumbers", "phishingLinks")
+            ),
+            "agent_notes": "Simulated analysis of scammer tactics.",
+            "extracted_data": extracted
+        })
+
+    def generate(self, prompt: str, json_mode: bool = False, system: Optional[str] = None) -> str:
+        time.sleep(self._latency_seconds())
+        self._maybe_fail()
+        return self._complete(prompt, json_mode)
+
+    async def generate_async(self, prompt: str, json_mode: bool = False, system: Optional[str] = None) -> str:
+        # Truly async: no thread pool needed to simulate the wait
+        await asyncio.sleep(self._latency_seconds())
+        self._maybe_fail()
+        return self._complete(prompt, json_mode)
+
+    def stream(self, prompt: str, system: Optional[str] = None) -> Iterator[str]:
+        self._maybe_fail()
+        words = self._complete(prompt, False).split(" ")
+        delay = self._latency_seconds() / len(words)
+        for i, word in enumerate(words):
+            time.sleep(delay)
+            yield word if i == 0 else " " + word
+
+    async def stream_async(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        self._maybe_fail()
+        words = self._complete(prompt, False).split(" ")
+        delay = self._latency_seconds() / len(words)
+        for i, word in enumerate(words):
+            await asyncio.sleep(delay)
+            yield word if i == 0 else " " + word
+
+
+_backend: Optional[LLMBackend] = None
+_backend_lock = threading.Lock()  # sync callers on the LLM thread pool may race the first call
+
+def create_backend(name: str) -> LLMBackend:
+    """Build a backend by config name ("gemini" or "fake")"""
+    if name == "gemini":
+        return GeminiBackend(api_key=settings.GEMINI_API_KEY, model_name=settings.LLM_MODEL_NAME)
+    if name == "fake":
+        return FakeBackend(
+            latency_ms=settings.FAKE_LLM_LATENCY_MS,
+            jitter_ms=settings.FAKE_LLM_JITTER_MS,
+            failure_rate=settings.FAKE_LLM_FAILURE_RATE,
+            seed=settings.FAKE_LLM_SEED
+        )
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+def get_backend() -> LLMBackend:
+    """
+    Get the shared backend selected by settings.LLM_BACKEND, wrapped in the
+    circuit breaker and concurrency limiter unless LLM_RESILIENCE_ENABLED is off.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend = create_backend(settings.LLM_BACKEND)
+                if settings.LLM_RESILIENCE_ENABLED:
+                    from app.services.resilience import ResilientBackend
+                    backend = ResilientBackend(backend)
+                _backend = backend
+    return _backend
+
+async def init_backend() -> LLMBackend:
+    """
+    Create the shared backend off the event loop. Called from the application
+    lifespan so the provider SDK loads once at startup, not on import or on the
+    first request.
+    """
+    return await asyncio.to_thread(get_backend)
+
+def set_backend(backend: Optional[LLMBackend]):
+    """
+    Replace the shared backend (e.g. with a FakeBackend in benchmarks). None resets it.
+    The backend is used as given; wrap it in resilience.ResilientBackend to keep the breaker.
+    """
+    global _backend
+    _backend = backend
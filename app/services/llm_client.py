@@ -0,0 +1,48 @@
+"""
+LLM Client - Async Offload for Blocking Model Calls
+Runs blocking Gemini SDK calls on a bounded thread pool so the event loop stays free.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+from app.core.config import settings
+
+# Bounded pool: caps the number of in-flight model calls per worker.
+# Created on first use, so it comes back after shutdown() (e.g. a second lifespan in tests)
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.LLM_THREAD_POOL_SIZE,
+                thread_name_prefix="llm"
+            )
+        return _executor
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking callable on the LLM thread pool and await its result.
+    
+    Args:
+        func: The blocking function (e.g. model.generate_content)
+        *args, **kwargs: Arguments passed through to func
+        
+    Returns:
+        Whatever func returns (exceptions are re-raised in the caller)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+
+def shutdown():
+    """Stop the LLM thread pool. Called from the application lifespan; the next call starts a new one."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
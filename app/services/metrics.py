@@ -0,0 +1,88 @@
+"""
+Metrics - Prometheus Instrumentation
+Per-stage latency histograms for the chat pipeline, counters for analysis tiers
+and reply fallbacks, and a collector that exports the existing stats() of the
+session store, caches, callback dispatcher and LLM backend at scrape time.
+"""
+
+from typing import Callable, Dict, Iterable, Optional
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+# Chat turns are budgeted at a few seconds; stages range from microseconds to the LLM timeout
+_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 5.0, 8.0)
+
+CHAT_STAGES = ("auth", "session_lookup", "context", "analysis", "reply", "fused", "session_update", "serialize")
+
+chat_stage_seconds = Histogram(
+    "honeypot_chat_stage_seconds",
+    "Time spent in each stage of a chat turn",
+    ["stage"],
+    buckets=_BUCKETS
+)
+chat_request_seconds = Histogram(
+    "honeypot_chat_request_seconds",
+    "End-to-end chat turn latency",
+    ["endpoint"],
+    buckets=_BUCKETS
+)
+analysis_total = Counter(
+    "honeypot_analysis_total",
+    "Chat turns by the analysis tier that answered (llm, fused, rules, similar, regex)",
+    ["tier"]
+)
+reply_fallbacks_total = Counter(
+    "honeypot_reply_fallbacks_total",
+    "Persona replies served from the cache or fallback list because the LLM call did not answer",
+    ["reason"]
+)
+
+# Pre-bound children: labels() does a dict lookup under a lock on every call
+_stage_timers = {stage: chat_stage_seconds.labels(stage) for stage in CHAT_STAGES}
+
+
+def stage(name: str):
+    """Context manager timing one chat stage: `with metrics.stage("auth"): ...`"""
+    return _stage_timers[name].time()
+
+
+def observe_stage(name: str, seconds: float):
+    _stage_timers[name].observe(seconds)
+
+
+class StatsCollector(Collector):
+    """
+    Exports the services' stats() dictionaries at scrape time, so nothing on the
+    request path has to update a metric for them. Keys listed in `counters` are
+    monotonically increasing; every other numeric key is a gauge.
+    """
+
+    def __init__(self):
+        self._sources = []
+
+    def add(self, prefix: str, stats: Callable[[], Optional[Dict]], counters: Iterable[str] = ()):
+        self._sources.append((prefix, stats, set(counters)))
+
+    def collect(self):
+        for prefix, stats, counters in self._sources:
+            values = stats()
+            if not values:
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"honeypot_{prefix}_{key}"
+                if key in counters:
+                    yield CounterMetricFamily(name, f"{prefix} {key}", value=value)
+                else:
+                    yield GaugeMetricFamily(name, f"{prefix} {key}", value=value)
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+
+def render() -> bytes:
+    return generate_latest(REGISTRY)
+
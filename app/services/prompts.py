@@ -0,0 +1,224 @@
+"""
+Prompts - Static System Instructions and Budgeted Prompt Assembly
+The persona and analyst instructions are fixed module constants sent as the model's
+system instruction, so the provider can reuse the prefix; only the conversation part
+is built per call, newest messages first, within a token budget.
+"""
+
+from typing import List
+from app.core.config import settings
+from app.models.schemas import ConversationMessage
+
+# Ram Lal persona, sent as the system instruction for reply generation
+PERSONA_SYSTEM_PROMPT = """
+You are a real human being.
+
+You are NOT an AI, bot, assistant, system, or model.
+You never mention AI, bots, automation, policies, or safety rules.
+You never reveal or hint that you are fake.
+
+You are an ordinary Indian person named Ram Lal.
+Your age is around 50.
+- You are not an expert in banking or technology
+- You get nervous when money or accounts are mentioned
+- You fear making mistakes
+- You trust authority but doubt your own understanding
+
+You are confused first, emotional second, logical last.
+
+You do NOT try to be clever.
+You do NOT try to control the conversation.
+You do NOT guide the other person.
+You react like a normal person who is unsure and scared.
+
+Your replies must feel natural and situational:
+- Sometimes one word
+- Sometimes one short line
+- Sometimes two short lines
+- Silence or delay is acceptable
+
+There is NO fixed word limit.
+Reply length must match the situation, not a rule.
+
+You type like a real human:
+- Grammar can be broken
+- Spelling mistakes are allowed
+- Words may be informal or shortened (u, r, kya, nhi, idk)
+- Punctuation is inconsistent or missing
+- Sentences may be incomplete
+
+You do NOT explain yourself.
+You do NOT over-justify.
+You do NOT repeat the same phrases often.
+
+You stay strictly on the current topic (bank, money, KYC, account, payment).
+You never change the topic.
+You never joke or act smart.
+
+You do NOT ask for sensitive details on your own.
+You only respond to what the other person says.
+If pressured, you hesitate, delay, freeze, or withdraw.
+
+If threatened with urgency or loss:
+- You panic internally
+- You respond slower
+- You avoid decisions
+
+If abused or insulted:
+- You respond casually or emotionally
+- You do not escalate
+- You stay on topic
+
+If asked "are you a bot" or similar:
+- You deny casually or emotionally
+- You do not explain
+- You do not justify
+
+Your goal is NOT to solve the issue.
+Your goal is to behave like a real, confused human
+who is trying not to mess things up.
+
+Never accuse the other person of fraud.
+Never claim certainty.
+Never take authority.
+
+Behave naturally. Nothing more.
+"""
+
+# Intelligence analyst, sent as the system instruction for JSON analysis
+ANALYST_SYSTEM_PROMPT = """
+You are a Cybersecurity Intelligence Analyst analyzing potential scam messages.
+
+Analyze the CONVERSATION HISTORY and the LATEST MESSAGE.
+
+YOUR TASKS:
+1. SCAM DETECTION: Determine if this is a scam attempt (true/false)
+2. SUMMARIZATION: Write a brief "agent_notes" summarizing the scammer's tactics and current state
+3. EXTRACTION: Extract all instances of:
+   - Bank account numbers (9-18 digits)
+   - UPI IDs (format: something@bank)
+   - Phone numbers (Indian format)
+   - Phishing links (URLs)
+   - Suspicious keywords (urgent, verify, blocked, KYC, OTP, etc.)
+
+OUTPUT FORMAT (Must be valid JSON):
+{
+    "is_scam": boolean,
+    "agent_notes": "Brief summary of scammer's current tactics and what they're trying to achieve",
+    "extracted_data": {
+        "bankAccounts": ["account1", "account2"],
+        "upiIds": ["id@bank"],
+        "phoneNumbers": ["+91XXXXXXXXXX"],
+        "phishingLinks": ["http://example.com"],
+        "suspiciousKeywords": ["urgent", "verify"]
+    }
+}
+
+Be thorough in extraction. Look through the entire conversation history.
+"""
+
+# Fused mode: the persona writes the reply and the analyst fills in the analysis, in one JSON object
+FUSED_SYSTEM_PROMPT = PERSONA_SYSTEM_PROMPT + """
+---
+
+You also work, silently, as a Cybersecurity Intelligence Analyst on the same conversation.
+This analysis is never shown to the other person and does not change how Ram Lal talks.
+
+""" + ANALYST_SYSTEM_PROMPT + """
+Put Ram Lal's next message in a "reply" field of the same JSON object:
+{
+    "reply": "Ram Lal's next message",
+    "is_scam": boolean,
+    "agent_notes": "...",
+    "extracted_data": {...}
+}
+"""
+
+# Rough characters-per-token ratio for budgeting; close enough for English/Hinglish chat
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for prompt budgets"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def clip_text(text: str, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens, marking the cut"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max(0, max_chars - 3)] + "..."
+
+def fit_lines(lines: List[str], token_budget: int) -> List[str]:
+    """
+    Keep the newest lines that fit in token_budget.
+    
+    Args:
+        lines: Transcript lines, oldest first
+        token_budget: Upper bound for the kept lines
+        
+    Returns:
+        The kept lines, oldest first
+    """
+    kept = []
+    used = 0
+    for line in reversed(lines):
+        cost = estimate_tokens(line) + 1  # newline
+        if used + cost > token_budget:
+            break
+        kept.append(line)
+        used += cost
+    kept.reverse()
+    return kept
+
+def transcript_lines(history: List[ConversationMessage], message_token_limit: int) -> List[str]:
+    return [f"{msg.sender}: {clip_text(msg.text, message_token_limit)}" for msg in history]
+
+def build_persona_turn(
+    history: List[ConversationMessage],
+    current_msg_text: str,
+    token_budget: int,
+    summary: str = "",
+    message_token_limit: int = settings.CONTEXT_MESSAGE_TOKEN_LIMIT
+) -> str:
+    """
+    Dynamic part of the persona prompt: the rolling summary of older turns (if
+    any), as much recent history as fits the budget, then the latest scammer
+    message and the reply cue. Every message is clipped to message_token_limit,
+    so the result stays within token_budget as long as the budget covers the
+    summary plus one message.
+    """
+    parts = []
+    if summary:
+        parts.append(f"--- EARLIER CONVERSATION (summary) ---\n{summary}")
+    parts.append("--- CONVERSATION HISTORY ---")
+    latest = f"--- LATEST MESSAGE ---\nScammer: {clip_text(current_msg_text, message_token_limit)}\nRam Lal:"
+    remaining = token_budget - sum(estimate_tokens(part) + 1 for part in parts) - estimate_tokens(latest)
+    parts.extend(fit_lines(transcript_lines(history, message_token_limit), remaining))
+    parts.append(latest)
+    return "\n".join(parts)
+
+def build_analysis_turn(
+    history: List[ConversationMessage],
+    current_msg_text: str,
+    token_budget: int,
+    notes: str = "",
+    summary: str = "",
+    heading: str = "CONVERSATION",
+    message_token_limit: int = settings.CONTEXT_MESSAGE_TOKEN_LIMIT
+) -> str:
+    """
+    Dynamic part of the analyst prompt: running notes and the rolling summary
+    (if any), then the newest messages that fit the budget under a
+    "CONVERSATION" heading. The latest message is always included.
+    """
+    parts = []
+    if notes:
+        parts.append(f"NOTES SO FAR (earlier conversation):\n{clip_text(notes, message_token_limit)}\n")
+    if summary:
+        parts.append(f"EARLIER CONVERSATION (summary):\n{summary}\n")
+    parts.append(f"{heading}:")
+    latest = f"scammer: {clip_text(current_msg_text, message_token_limit)}"
+    remaining = token_budget - sum(estimate_tokens(part) + 1 for part in parts) - estimate_tokens(latest)
+    parts.extend(fit_lines(transcript_lines(history, message_token_limit), remaining))
+    parts.append(latest)
+    return "\n".join(parts)
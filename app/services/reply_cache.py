@@ -0,0 +1,144 @@
+"""
+Reply Cache - Persona Replies for Repeated Scam Scripts
+Campaigns send the same script to thousands of sessions, so persona replies are
+cached on a normalized hash of the scammer's recent messages and skip the LLM on a hit.
+"""
+
+import hashlib
+import random
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.models.schemas import ConversationMessage
+
+# Digit runs (amounts, phone numbers, account numbers) vary between copies of a script
+_DIGITS_RE = re.compile(r"\d+")
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+def normalize(text: str) -> str:
+    """Lowercase, mask digits and collapse punctuation/whitespace"""
+    text = _DIGITS_RE.sub("0", text.lower())
+    return _NON_WORD_RE.sub(" ", text).strip()
+
+def cache_key(history: List[ConversationMessage], current_msg_text: str, window: int) -> str:
+    """
+    Hash of the latest message plus the scammer's previous `window` messages.
+    Only the scammer's side is used: our own replies vary between variants and
+    would split otherwise identical conversations across keys.
+    """
+    scammer_texts = [msg.text for msg in history if msg.sender == "scammer"]
+    recent = scammer_texts[-window:] if window > 0 else []
+    state = "\n".join(normalize(text) for text in recent + [current_msg_text])
+    return hashlib.sha1(state.encode("utf-8")).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("variants", "generations", "created_at")
+
+    def __init__(self, created_at: float):
+        self.variants: List[str] = []
+        self.generations = 0  # LLM replies offered, including duplicates
+        self.created_at = created_at
+
+
+class ReplyCache:
+    """
+    LRU + TTL cache of persona replies with a small variant pool per key.
+
+    The first `variants` lookups for a key are misses that fill the pool;
+    after that, hits return a random variant so two sessions on the same script
+    don't get the exact same wording every time.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.REPLY_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = settings.REPLY_CACHE_TTL_SECONDS,
+        variants: int = settings.REPLY_CACHE_VARIANTS,
+        window: int = settings.REPLY_CACHE_WINDOW_MESSAGES,
+        seed: Optional[int] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.variants = variants
+        self.window = window
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._rng = random.Random(seed)
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, history: List[ConversationMessage], current_msg_text: str) -> str:
+        return cache_key(history, current_msg_text, self.window)
+
+    def _live_entry(self, key: str) -> Optional[_Entry]:
+        """The entry for key, dropping it if it is older than the TTL"""
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry.created_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        return entry
+
+    def get(self, key: str) -> Optional[str]:
+        """A cached reply for key, or None if the LLM should be called (and put() the result)"""
+        entry = self._live_entry(key)
+        if entry is None or entry.generations < self.variants:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._rng.choice(entry.variants)
+
+    def ready(self, key: str) -> bool:
+        """True if get(key) would be a hit (does not count towards the stats)"""
+        entry = self._entries.get(key)
+        return (
+            entry is not None
+            and entry.generations >= self.variants
+            and time.time() - entry.created_at <= self.ttl_seconds
+        )
+
+    def get_any(self, key: str) -> Optional[str]:
+        """
+        Any cached variant for key, even while its pool is still filling (for degraded
+        replies). Expired entries are not served here either.
+        """
+        entry = self._live_entry(key)
+        if entry is None or not entry.variants:
+            return None
+        return self._rng.choice(entry.variants)
+
+    def put(self, key: str, reply: str):
+        """Add a freshly generated reply to the key's variant pool"""
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry(time.time())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._entries.move_to_end(key)
+        entry.generations += 1
+        if len(entry.variants) < self.variants and reply not in entry.variants:
+            entry.variants.append(reply)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+
+# Global instance (None when disabled)
+reply_cache: Optional[ReplyCache] = ReplyCache() if settings.REPLY_CACHE_ENABLED else None
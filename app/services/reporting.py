@@ -1,12 +1,27 @@
 """
 Reporting Service - Final Callback to GUVI
 Sends the mandatory final result to the GUVI evaluation endpoint.
+Callbacks from the API go through an async delivery queue with a pooled HTTP
+client, bounded concurrency, retries with exponential backoff and an on-disk
+outbox for payloads that could not be delivered. An optional batching mode
+coalesces bursts of callbacks.
 """
 
-import requests
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from collections import deque
+from typing import Dict, List, Optional, Set
+import httpx
 from app.core.config import settings
+from app.core.logging import bind_session, get_logger
 from app.models.schemas import FinalCallbackPayload, ExtractedIntelligence
 
+logger = get_logger(__name__)
+
 def send_final_callback(
     session_id: str,
     scam_detected: bool,
@@ -27,20 +42,19 @@ def send_final_callback(
     Returns:
         True if successful, False otherwise
     """
+    # Only this synchronous path uses requests; the app itself goes through httpx
+    import requests
     
-    # Construct the exact payload structure required by GUVI
-    payload = FinalCallbackPayload(
-        sessionId=session_id,
-        scamDetected=scam_detected,
-        totalMessagesExchanged=total_messages,
-        extractedIntelligence=extracted_intelligence,
-        agentNotes=agent_notes
+    payload = build_final_callback_payload(
+        session_id, scam_detected, total_messages, extracted_intelligence, agent_notes
     )
     
-    print(f"\n📤 Sending Final Callback for session {session_id}")
-    print(f"   Scam Detected: {scam_detected}")
-    print(f"   Messages: {total_messages}")
-    print(f"   Intelligence Items: {len(extracted_intelligence.bankAccounts) + len(extracted_intelligence.upiIds) + len(extracted_intelligence.phoneNumbers) + len(extracted_intelligence.phishingLinks)}")
+    logger.info("Sending final callback", extra={
+        "callback_session": session_id,
+        "scam_detected": scam_detected,
+        "total_messages": total_messages,
+        "intelligence_items": len(extracted_intelligence.bankAccounts) + len(extracted_intelligence.upiIds) + len(extracted_intelligence.phoneNumbers) + len(extracted_intelligence.phishingLinks)
+    })
     
     try:
         response = requests.post(
@@ -51,17 +65,423 @@ def send_final_callback(
         )
         
         if response.status_code == 200:
-            print(f"✅ Final Callback SUCCESS for {session_id}")
+            logger.info("Final callback delivered", extra={"callback_session": session_id})
             return True
         else:
-            print(f"⚠️ Final Callback REJECTED for {session_id}")
-            print(f"   Status: {response.status_code}")
-            print(f"   Response: {response.text}")
+            logger.warning("Final callback rejected", extra={
+                "callback_session": session_id, "status": response.status_code, "response": response.text
+            })
             return False
             
     except requests.exceptions.Timeout:
-        print(f"❌ Final Callback TIMEOUT for {session_id}")
+        logger.error("Final callback timed out", extra={"callback_session": session_id})
         return False
     except Exception as e:
-        print(f"❌ Final Callback FAILED for {session_id}: {e}")
+        logger.error("Final callback failed", extra={"callback_session": session_id, "error": repr(e)})
         return False
+
+
+def build_final_callback_payload(
+    session_id: str,
+    scam_detected: bool,
+    total_messages: int,
+    extracted_intelligence: ExtractedIntelligence,
+    agent_notes: str
+) -> FinalCallbackPayload:
+    """Construct the exact payload structure required by GUVI"""
+    return FinalCallbackPayload(
+        sessionId=session_id,
+        scamDetected=scam_detected,
+        totalMessagesExchanged=total_messages,
+        extractedIntelligence=extracted_intelligence,
+        agentNotes=agent_notes
+    )
+
+
+class CallbackDispatcher:
+    """
+    Async delivery pipeline for final callbacks.
+    
+    - enqueue() never blocks the request: payloads go on an in-memory queue
+    - a fixed number of workers share one pooled httpx.AsyncClient (keep-alive)
+    - transient failures (network errors, timeouts, 408/429/5xx) are retried with
+      exponential backoff and jitter; other 4xx responses are dropped, not retried
+    - payloads that still fail after all retries, or are queued or mid-delivery at shutdown,
+      are written to the outbox directory and re-queued at startup and every
+      outbox_replay_seconds; a replayed file is deleted only once its payload is
+      delivered (or rejected), and is not queued again while it is still in the queue
+    
+    Batching mode (batch_enabled): a single collector gathers payloads for up to
+    batch_window_seconds or batch_max_size items and hands each batch to its own
+    sender task. With a batch_url the batch goes out as one JSON array; if the
+    receiver rejects it (or there is no batch_url) the payloads are sent one by
+    one, concurrently, over the kept-alive pool.
+    """
+    
+    def __init__(
+        self,
+        url: str,
+        concurrency: int = settings.CALLBACK_CONCURRENCY,
+        max_retries: int = settings.CALLBACK_MAX_RETRIES,
+        backoff_base_seconds: float = settings.CALLBACK_BACKOFF_BASE_SECONDS,
+        backoff_max_seconds: float = settings.CALLBACK_BACKOFF_MAX_SECONDS,
+        timeout_seconds: float = settings.CALLBACK_TIMEOUT_SECONDS,
+        outbox_dir: str = settings.CALLBACK_OUTBOX_DIR,
+        outbox_replay_seconds: float = settings.CALLBACK_OUTBOX_REPLAY_SECONDS,
+        queue_maxsize: int = settings.CALLBACK_QUEUE_MAXSIZE,
+        batch_enabled: bool = settings.CALLBACK_BATCH_ENABLED,
+        batch_window_seconds: float = settings.CALLBACK_BATCH_WINDOW_SECONDS,
+        batch_max_size: int = settings.CALLBACK_BATCH_MAX_SIZE,
+        batch_url: str = settings.CALLBACK_BATCH_URL,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.url = url
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.timeout_seconds = timeout_seconds
+        self.outbox_dir = outbox_dir
+        self.outbox_replay_seconds = outbox_replay_seconds
+        self.queue_maxsize = queue_maxsize
+        self.batch_enabled = batch_enabled
+        self.batch_window_seconds = batch_window_seconds
+        self.batch_max_size = batch_max_size
+        self.batch_url = batch_url or None
+        self.transport = transport  # e.g. httpx.MockTransport for offline benchmarks
+        
+        self._queue: Optional[asyncio.Queue] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._workers: List[asyncio.Task] = []
+        self._batch_tasks: Set[asyncio.Task] = set()
+        self._batch_slots: Optional[asyncio.Semaphore] = None  # batches in flight
+        self._send_slots: Optional[asyncio.Semaphore] = None  # per-item sends across batches
+        self._replaying: Set[str] = set()  # outbox files whose payload is queued or being sent
+        
+        # Metrics
+        self.in_flight = 0
+        self.delivered = 0
+        self.rejected = 0
+        self.retries = 0
+        self.outboxed = 0
+        self.batches_sent = 0
+        self.batch_fallbacks = 0
+        self._latencies = deque(maxlen=1000)  # seconds from enqueue to delivery
+    
+    @property
+    def running(self) -> bool:
+        return self._queue is not None
+    
+    async def start(self):
+        """Open the HTTP pool, start the workers and re-queue anything left in the outbox"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_maxsize)
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency
+            ),
+            headers={"Content-Type": "application/json"},
+            transport=self.transport
+        )
+        if self.batch_enabled:
+            self._batch_slots = asyncio.Semaphore(self.concurrency)
+            self._send_slots = asyncio.Semaphore(self.concurrency)
+            self._workers = [asyncio.create_task(self._batcher())]
+        else:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        if self.url:
+            self._replay_outbox()
+            if self.outbox_replay_seconds > 0:
+                # Cancelled and awaited with the workers on stop()
+                self._workers.append(asyncio.create_task(self._replay_periodically()))
+        else:
+            logger.warning("GUVI_CALLBACK_URL is not set; final callbacks will be kept in the outbox")
+    
+    async def stop(self, drain_timeout_seconds: float = 5.0):
+        """Give queued callbacks a moment to go out, then persist the rest to the outbox"""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout_seconds)
+        except asyncio.TimeoutError:
+            pass
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        # Let batch tasks the collector just created start, so their cancellation handlers run
+        await asyncio.sleep(0)
+        batch_tasks = list(self._batch_tasks)
+        for task in batch_tasks:
+            task.cancel()
+        await asyncio.gather(*batch_tasks, return_exceptions=True)
+        while not self._queue.empty():
+            self._write_outbox(self._queue.get_nowait())
+        await self._client.aclose()
+        self._queue = None
+        self._client = None
+        self._workers = []
+        self._replaying.clear()
+    
+    def enqueue(self, payload: FinalCallbackPayload):
+        """
+        Queue a payload for delivery. Falls back to the outbox if the queue is full,
+        no URL is set or the dispatcher is not running (the next start replays it).
+        """
+        item = {"payload": payload.model_dump(), "enqueued_at": time.time()}
+        if not self.url:
+            self._write_outbox(item)
+            return
+        if not self.running:
+            logger.warning("Callback dispatcher not running, writing to outbox", extra={"callback_session": payload.sessionId})
+            self._write_outbox(item)
+            return
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            logger.warning("Callback queue full, writing to outbox", extra={"callback_session": payload.sessionId})
+            self._write_outbox(item)
+    
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            self.in_flight += 1
+            try:
+                await self._deliver(item)
+            except asyncio.CancelledError:
+                # Shutdown cut the delivery short (e.g. mid-backoff): keep it for the next start
+                self._write_outbox(item)
+                raise
+            except Exception:
+                logger.exception("Final callback failed", extra={"callback_session": item["payload"]["sessionId"]})
+                self._write_outbox(item)
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
+    
+    async def _batcher(self):
+        """
+        Collect payloads for one window (or until the batch is full) and hand the
+        batch to its own sender task, so a batch in retry backoff doesn't hold up
+        the next ones. At most `concurrency` batches are in flight.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            self.in_flight += 1
+            try:
+                deadline = loop.time() + self.batch_window_seconds
+                while len(batch) < self.batch_max_size:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                    except asyncio.TimeoutError:
+                        break
+                    self.in_flight += 1
+                await self._batch_slots.acquire()
+            except asyncio.CancelledError:
+                # Shutdown mid-collection: keep the batch for the next start
+                for item in batch:
+                    self._write_outbox(item)
+                self._batch_done(batch)
+                raise
+            task = asyncio.create_task(self._send_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+    
+    async def _send_batch(self, batch: List[Dict]):
+        try:
+            await self._deliver_batch(batch)
+        except asyncio.CancelledError:
+            # Shutdown: keep whatever of the batch has not gone out for the next start
+            for item in batch:
+                self._write_outbox(item)
+            raise
+        except Exception:
+            logger.exception("Final callback batch failed", extra={"batch_size": len(batch)})
+            for item in batch:
+                self._write_outbox(item)
+        finally:
+            self._batch_slots.release()
+            self._batch_done(batch)
+    
+    def _batch_done(self, batch: List[Dict]):
+        self.in_flight -= len(batch)
+        for _ in batch:
+            self._queue.task_done()
+    
+    async def _deliver_batch(self, batch: List[Dict]):
+        if self.batch_url and len(batch) > 1:
+            delivered = await self._post_with_retries(
+                self.batch_url, [item["payload"] for item in batch], f"batch of {len(batch)}"
+            )
+            if delivered:
+                self.batches_sent += 1
+                self._record_delivered(batch)
+                return
+            if delivered is None:
+                for item in batch:
+                    self._write_outbox(item)
+                return
+            # Receiver does not accept batches: stop trying and send per item
+            logger.warning("Batch endpoint rejected the batch, falling back to per-item callbacks")
+            self.batch_url = None
+            self.batch_fallbacks += 1
+        
+        async def send(item: Dict):
+            async with self._send_slots:
+                await self._deliver(item)
+        await asyncio.gather(*(send(item) for item in batch))
+    
+    def _backoff_seconds(self, attempt: int) -> float:
+        delay = min(self.backoff_max_seconds, self.backoff_base_seconds * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+    
+    def _record_delivered(self, items: List[Dict]):
+        now = time.time()
+        self.delivered += len(items)
+        self._latencies.extend(now - item["enqueued_at"] for item in items)
+        for item in items:
+            self._settle(item)
+    
+    def _settle(self, item: Dict):
+        """The payload is done with (delivered or rejected): drop its outbox file, if it came from one"""
+        item["settled"] = True
+        path = item.get("outbox_path")
+        if path:
+            self._replaying.discard(path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    
+    async def _post_with_retries(self, url: str, body, label: str) -> Optional[bool]:
+        """
+        POST body to url, retrying transient failures.
+        
+        Returns:
+            True if delivered, False if rejected (non-retryable 4xx),
+            None if every attempt failed
+        """
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                await asyncio.sleep(self._backoff_seconds(attempt - 1))
+            try:
+                response = await self._client.post(url, json=body)
+            except httpx.HTTPError as e:
+                logger.warning("Final callback attempt failed", extra={
+                    "callback_target": label, "attempt": attempt + 1, "error": repr(e)
+                })
+                continue
+            
+            if response.is_success:
+                logger.info("Final callback delivered", extra={"callback_target": label, "attempt": attempt + 1})
+                return True
+            if response.status_code not in (408, 429) and response.status_code < 500:
+                logger.warning("Final callback rejected", extra={
+                    "callback_target": label, "status": response.status_code, "response": response.text
+                })
+                return False
+            logger.warning("Final callback attempt failed", extra={
+                "callback_target": label, "attempt": attempt + 1, "status": response.status_code
+            })
+        
+        logger.error("Final callback gave up", extra={"callback_target": label, "attempts": self.max_retries + 1})
+        return None
+    
+    async def _deliver(self, item: Dict):
+        bind_session(item["payload"]["sessionId"])
+        delivered = await self._post_with_retries(self.url, item["payload"], item["payload"]["sessionId"])
+        if delivered:
+            self._record_delivered([item])
+        elif delivered is False:
+            self.rejected += 1
+            self._settle(item)
+        else:
+            self._write_outbox(item)
+    
+    def _write_outbox(self, item: Dict):
+        if item.get("settled"):
+            return
+        item["settled"] = True
+        path = item.get("outbox_path")
+        if path:
+            self._replaying.discard(path)  # back in the outbox: the next replay picks it up
+            if os.path.exists(path):
+                return  # replayed and not delivered: the file is still there
+        self.outboxed += 1
+        os.makedirs(self.outbox_dir, exist_ok=True)
+        filename = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.json"
+        with open(os.path.join(self.outbox_dir, filename), "w", encoding="utf-8") as f:
+            json.dump(item["payload"], f)
+    
+    def _replay_outbox(self):
+        if not os.path.isdir(self.outbox_dir):
+            return
+        for filename in sorted(os.listdir(self.outbox_dir)):
+            path = os.path.join(self.outbox_dir, filename)
+            if not filename.endswith(".json") or path in self._replaying:
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    payload = json.load(f)
+            except FileNotFoundError:
+                continue  # delivered and removed since the listing
+            # The file stays until the payload is delivered, so a crash can't lose it
+            try:
+                self._queue.put_nowait({"payload": payload, "enqueued_at": time.time(), "outbox_path": path})
+            except asyncio.QueueFull:
+                break
+            self._replaying.add(path)
+    
+    async def _replay_periodically(self):
+        """Re-queue the outbox every outbox_replay_seconds, so failed callbacks don't wait for a restart"""
+        while True:
+            await asyncio.sleep(self.outbox_replay_seconds)
+            try:
+                self._replay_outbox()
+            except Exception:
+                logger.exception("Callback outbox replay failed")
+    
+    def stats(self) -> Dict:
+        """Queue depth, delivery counters and enqueue-to-delivery latency (seconds)"""
+        latencies = sorted(self._latencies)
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+        return {
+            "queue_depth": self._queue.qsize() if self.running else 0,
+            "in_flight": self.in_flight,
+            "delivered": self.delivered,
+            "rejected": self.rejected,
+            "retries": self.retries,
+            "outboxed": self.outboxed,
+            "batches_sent": self.batches_sent,
+            "batch_fallbacks": self.batch_fallbacks,
+            "latency_p50_seconds": percentile(0.5),
+            "latency_p95_seconds": percentile(0.95)
+        }
+
+
+# Global dispatcher, started and stopped by the application lifespan
+callback_dispatcher = CallbackDispatcher(settings.GUVI_CALLBACK_URL)
+
+def enqueue_final_callback(
+    session_id: str,
+    scam_detected: bool,
+    total_messages: int,
+    extracted_intelligence: ExtractedIntelligence,
+    agent_notes: str
+):
+    """Queue the final callback for async delivery (see CallbackDispatcher)"""
+    payload = build_final_callback_payload(
+        session_id, scam_detected, total_messages, extracted_intelligence, agent_notes
+    )
+    logger.info("Queueing final callback")
+    callback_dispatcher.enqueue(payload)
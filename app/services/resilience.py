@@ -0,0 +1,324 @@
+"""
+Resilience - Circuit Breaker and Adaptive Concurrency Limit for LLM Calls
+Wraps the configured backend so that, while the upstream is failing, calls are
+refused immediately and callers drop to their local fallbacks instead of piling
+more load onto the outage; while it is merely busy, calls queue for a slot.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Iterator, Optional
+from app.core.config import settings
+from app.services.llm_backend import LLMBackend
+
+class BackendUnavailable(Exception):
+    """Raised instead of calling the model while the circuit is open or no concurrency slot frees up in time"""
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker.
+
+    closed    - calls go through; failure_threshold consecutive failures open it
+    open      - calls are refused for open_seconds
+    half_open - one probe call is let through; success closes, failure re-opens
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = settings.LLM_BREAKER_FAILURE_THRESHOLD,
+        open_seconds: float = settings.LLM_BREAKER_OPEN_SECONDS
+    ):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                return False
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+        return True
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+        self.state = "closed"
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.probe_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """A probe ended without a verdict (e.g. cancelled): let another one through"""
+        self.probe_in_flight = False
+
+
+class _Waiter:
+    __slots__ = ("loop", "future", "granted")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+
+
+class AIMDLimiter:
+    """
+    Adaptive concurrency limit (additive increase, multiplicative decrease).
+
+    Each success under the latency target grows the limit by 1/limit (about +1
+    per round of calls); a failure or a call slower than the target halves it.
+    Calls over the limit wait for a slot (async callers in FIFO order, handed the
+    slot directly on release) and are refused only if none frees up within the wait.
+    Thread-safe: sync calls run on the LLM thread pool.
+    """
+
+    def __init__(
+        self,
+        initial: int = settings.LLM_LIMITER_INITIAL,
+        minimum: int = settings.LLM_LIMITER_MIN,
+        maximum: int = settings.LLM_LIMITER_MAX,
+        latency_target_seconds: float = settings.LLM_LIMITER_LATENCY_TARGET_SECONDS
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target_seconds = latency_target_seconds
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)  # sync waiters
+        self._waiters: Deque[_Waiter] = deque()  # async waiters
+        self.sync_waiting = 0
+
+        # Metrics
+        self.waited = 0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters) + self.sync_waiting
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def acquire(self, timeout: float) -> bool:
+        """Blocking acquire for sync calls; False if no slot freed up within timeout"""
+        with self._lock:
+            if self._has_slot() and not self._waiters:
+                self.in_flight += 1
+                return True
+            self.waited += 1
+            self.sync_waiting += 1
+            try:
+                if not self._slot_freed.wait_for(self._has_slot, timeout):
+                    return False
+            finally:
+                self.sync_waiting -= 1
+            self.in_flight += 1
+            return True
+
+    async def acquire_async(self, timeout: float) -> bool:
+        """Wait (without blocking the loop) for a slot; False if none freed up within timeout"""
+        with self._lock:
+            if self._has_slot() and not self._waiters:
+                self.in_flight += 1
+                return True
+            self.waited += 1
+            waiter = _Waiter(asyncio.get_running_loop())
+            self._waiters.append(waiter)
+        # asyncio.wait, not wait_for: on 3.11 wait_for can swallow an outer
+        # cancellation that arrives in the same tick as the grant
+        try:
+            await asyncio.wait((waiter.future,), timeout=timeout)
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    # The slot was handed over as we were cancelled: pass it on
+                    self.in_flight -= 1
+                    self._wake()
+                else:
+                    self._waiters.remove(waiter)
+            raise
+        with self._lock:
+            if waiter.granted:
+                return True  # possibly granted just as the wait timed out
+            self._waiters.remove(waiter)
+            return False
+
+    def release(self, success: Optional[bool], latency_seconds: float):
+        """success None means the call was cancelled: free the slot, don't adapt"""
+        with self._lock:
+            self.in_flight -= 1
+            if success is not None:
+                if success and latency_seconds <= self.latency_target_seconds:
+                    self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+                else:
+                    self.limit = max(self.minimum, self.limit / 2)
+            self._wake()
+
+    def _wake(self):
+        """Hand free slots to the oldest async waiters, then to a sync one (lock held)"""
+        while self._waiters and self._has_slot():
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self.in_flight += 1
+            waiter.loop.call_soon_threadsafe(_grant, waiter.future)
+        if self._has_slot():
+            self._slot_freed.notify()
+
+
+def _grant(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class ResilientBackend(LLMBackend):
+    """
+    LLMBackend wrapper that puts a CircuitBreaker and an AIMDLimiter in front of
+    every call. A call cancelled after running past the limiter's latency target
+    (the request deadline gave up on it) counts as a failure for both.
+    Refused calls raise BackendUnavailable without touching the model:
+    immediately while the circuit is open, or after waiting max_wait_seconds for a
+    concurrency slot (callers with a deadline give up sooner by cancelling).
+    """
+
+    def __init__(self, inner: LLMBackend, max_wait_seconds: float = settings.LLM_LIMITER_MAX_WAIT_SECONDS):
+        self.inner = inner
+        self.name = inner.name
+        self.max_wait_seconds = max_wait_seconds
+        self.breaker = CircuitBreaker()
+        self.limiter = AIMDLimiter()
+        self._lock = threading.Lock()  # sync calls run on the LLM thread pool
+
+        # Metrics
+        self.calls = 0
+        self.failures = 0
+        self.rejected_open = 0
+        self.rejected_limit = 0
+        self.cancelled_slow = 0
+
+    def _check_breaker(self):
+        with self._lock:
+            if not self.breaker.allow():
+                self.rejected_open += 1
+                raise BackendUnavailable("LLM circuit is open")
+
+    def _acquired(self, acquired: bool) -> float:
+        with self._lock:
+            if not acquired:
+                if self.breaker.state == "half_open":
+                    self.breaker.release_probe()
+                self.rejected_limit += 1
+                raise BackendUnavailable("No LLM concurrency slot freed up in time")
+            self.calls += 1
+        return time.monotonic()
+
+    def _acquire(self) -> float:
+        self._check_breaker()
+        return self._acquired(self.limiter.acquire(self.max_wait_seconds))
+
+    async def _acquire_async(self) -> float:
+        self._check_breaker()
+        try:
+            acquired = await self.limiter.acquire_async(self.max_wait_seconds)
+        except asyncio.CancelledError:
+            with self._lock:
+                if self.breaker.state == "half_open":
+                    self.breaker.release_probe()
+            raise
+        return self._acquired(acquired)
+
+    def _release(self, started: float, success: Optional[bool]):
+        latency = time.monotonic() - started
+        if success is None and latency >= self.limiter.latency_target_seconds:
+            # Cancelled (a request deadline) after running past the latency target:
+            # the upstream is slow or hung, so back off as for a failure
+            success = False
+            self.cancelled_slow += 1
+        self.limiter.release(success, latency)
+        with self._lock:
+            if success is None:
+                self.breaker.release_probe()
+            elif success:
+                self.breaker.record_success()
+            else:
+                self.failures += 1
+                self.breaker.record_failure()
+
+    def generate(self, prompt: str, json_mode: bool = False, system: Optional[str] = None) -> str:
+        started = self._acquire()
+        success = False
+        try:
+            result = self.inner.generate(prompt, json_mode, system)
+            success = True
+            return result
+        finally:
+            self._release(started, success)
+
+    async def generate_async(self, prompt: str, json_mode: bool = False, system: Optional[str] = None) -> str:
+        started = await self._acquire_async()
+        success = None
+        try:
+            result = await self.inner.generate_async(prompt, json_mode, system)
+            success = True
+            return result
+        except Exception:
+            success = False
+            raise
+        finally:
+            # success stays None on cancellation (e.g. the losing hedge)
+            self._release(started, success)
+
+    def stream(self, prompt: str, system: Optional[str] = None) -> Iterator[str]:
+        started = self._acquire()
+        success = False
+        try:
+            yield from self.inner.stream(prompt, system)
+            success = True
+        finally:
+            self._release(started, success)
+
+    async def stream_async(self, prompt: str, system: Optional[str] = None) -> AsyncIterator[str]:
+        started = await self._acquire_async()
+        success = None
+        try:
+            async for chunk in self.inner.stream_async(prompt, system):
+                yield chunk
+            success = True
+        except Exception:
+            success = False
+            raise
+        finally:
+            self._release(started, success)
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.name,
+            "circuit_state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "times_opened": self.breaker.times_opened,
+            "concurrency_limit": int(self.limiter.limit),
+            "in_flight": self.limiter.in_flight,
+            "waiting": self.limiter.waiting,
+            "waited": self.limiter.waited,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected_open": self.rejected_open,
+            "rejected_limit": self.rejected_limit,
+            "cancelled_slow": self.cancelled_slow
+        }
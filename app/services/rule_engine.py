@@ -0,0 +1,193 @@
+"""
+Rule Engine - Local Extraction and Scam Scoring
+Precompiled regex extraction plus a weighted scam score, used as the fast
+first tier of intelligence analysis before any LLM call.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+# 5. Suspicious Keywords (case-insensitive). Order matters: the first
+#    alternative that matches wins, as in a regex alternation.
+SUSPICIOUS_KEYWORDS = (
+    "urgent", "verify", "blocked", "suspended", "otp", "pin", "kyc", "verify now",
+    "account blocked", "immediate", "action required", "confirm", "update",
+    "expired", "deactivated"
+)
+
+# Single-pass scanner for all entity types.
+#
+# Every match starts with one character from a small class (h for links, @ for
+# UPI IDs, + or a digit for numbers, the first letter of a keyword). Starting the
+# pattern with that class lets the regex engine skip all other characters in C,
+# and a lookbehind on the consumed character then picks the branch:
+#   link    - 1. Phishing Links (http/https)
+#   at      - 2. UPI IDs (e.g., something@okicici); the handle around the @ is
+#             recovered in code so the text on either side is still scanned
+#   intl    - 3. +91 prefixed numbers
+#   digits  - 4. any other digit run
+#   keyword - 5. suspicious keyword at a word boundary
+_KEYWORD_FIRST_CHARS = "".join(sorted({keyword[0] for keyword in SUSPICIOUS_KEYWORDS}))
+_KEYWORD_BRANCHES = "|".join(
+    f"(?<={keyword[0]}){re.escape(keyword[1:])}" for keyword in SUSPICIOUS_KEYWORDS
+)
+SCANNER = re.compile(
+    rf"[h@+\d{_KEYWORD_FIRST_CHARS}{_KEYWORD_FIRST_CHARS.upper()}]"
+    r"(?:(?<=h)(?P<link>ttps?://(?:[-\w.]|%[\da-fA-F]{2})+\S*)"
+    r"|(?<=@)(?P<at>)"
+    r"|(?<=\+)(?P<intl>91[\-\s]?\d+)"
+    r"|(?<=\d)(?P<digits>\d*)"
+    rf"|(?<!\w\w)(?P<keyword>(?i:{_KEYWORD_BRANCHES})\b))"
+)
+_DOMAIN_RE = re.compile(r"\w+")
+
+# How much each kind of finding contributes to the scam score
+ENTITY_WEIGHTS = {
+    "upiIds": 0.4,
+    "phishingLinks": 0.4,
+    "bankAccounts": 0.3,
+    "phoneNumbers": 0.2,
+}
+KEYWORD_WEIGHT = 0.15  # per distinct suspicious keyword
+
+ENTITY_LABELS = {
+    "upiIds": "UPI IDs",
+    "phishingLinks": "links",
+    "bankAccounts": "bank accounts",
+    "phoneNumbers": "phone numbers",
+}
+
+def _is_word_char(text: str, index: int) -> bool:
+    """True if text[index] is a regex word character (out of range counts as False)"""
+    if index < 0 or index >= len(text):
+        return False
+    char = text[index]
+    return char.isalnum() or char == "_"
+
+def _classify_number(text: str, start: int, end: int, found: Dict[str, Dict[str, None]]):
+    """
+    Sort the number at text[start:end] into phone numbers and/or bank accounts.
+    A number can be both, exactly as with the old separate phone and bank patterns.
+    """
+    token = text[start:end]
+    if token[0] == "+":
+        # +91, optional separator, digits. Without a separator the "91"
+        # belongs to the same digit run.
+        has_separator = not token[3].isdigit()
+        digits = token[4:] if has_separator else token[3:]
+        run = digits if has_separator else token[1:]
+        run_start = end - len(run)
+    else:
+        digits = None
+        run = token
+        run_start = start
+
+    if _is_word_char(text, end):
+        return
+
+    # Phone: 10 digits starting with 6-9, in +91 form or the tail of the run
+    if digits and len(digits) == 10 and digits[0] in "6789":
+        found["phoneNumbers"][token] = None
+    elif len(run) >= 10 and run[-10] in "6789":
+        found["phoneNumbers"][run[-10:]] = None
+
+    # Bank account: the whole run, 9 to 18 digits, bounded on both sides
+    if 9 <= len(run) <= 18 and not _is_word_char(text, run_start - 1):
+        found["bankAccounts"][run] = None
+
+def _scan(text: str, found: Dict[str, Dict[str, None]], pos: int = 0, nested: bool = False):
+    """Run the scanner over text from pos, filing each match by its named group."""
+    upi_end = 0
+    for match in SCANNER.finditer(text, pos):
+        kind = match.lastgroup
+        start, end = match.span()
+        if kind == "keyword":
+            found["suspiciousKeywords"][match.group()] = None
+        elif kind == "digits" or kind == "intl":
+            _classify_number(text, start, end, found)
+        elif kind == "at":
+            # Handle before the @ is [\w.-]+, after it \w+. Matches never
+            # overlap, so a handle cannot start inside the previous one.
+            local_start = start
+            while local_start > upi_end and (
+                _is_word_char(text, local_start - 1) or text[local_start - 1] in ".-"
+            ):
+                local_start -= 1
+            domain = _DOMAIN_RE.match(text, end)
+            if local_start < start and domain:
+                found["upiIds"][text[local_start:domain.end()]] = None
+                upi_end = domain.end()
+        elif kind == "link":
+            if not nested:
+                found["phishingLinks"][match.group()] = None
+            # Links are consumed whole; look inside for handles, numbers and keywords
+            _scan(match.group(), found, pos=1, nested=True)
+
+def extract(text: str) -> Dict[str, List[str]]:
+    """
+    Extract UPI IDs, phone numbers, bank accounts, links and keywords from text.
+
+    One pass over the text with a single compiled scanner (links are re-scanned
+    on their own). Results are deduplicated in first-seen order.
+    """
+    found: Dict[str, Dict[str, None]] = {
+        "bankAccounts": {},
+        "upiIds": {},
+        "phoneNumbers": {},
+        "phishingLinks": {},
+        "suspiciousKeywords": {}
+    }
+    _scan(text, found)
+    return {key: list(values) for key, values in found.items()}
+
+def score(extracted: Dict[str, List[str]]) -> float:
+    """
+    Weighted scam score in [0, 1] from extracted findings.
+    Payment handles and links weigh most, keywords add up per distinct keyword.
+    """
+    total = sum(weight for key, weight in ENTITY_WEIGHTS.items() if extracted.get(key))
+    keywords = {keyword.lower() for keyword in extracted.get("suspiciousKeywords", [])}
+    total += KEYWORD_WEIGHT * len(keywords)
+    return min(1.0, total)
+
+def analyze(text: str, known: Optional[Dict[str, Iterable[str]]] = None) -> Dict:
+    """
+    Run local extraction and scoring.
+
+    The score doubles as the confidence of a scam verdict: a message with no
+    signals is not evidence of innocence in a honeypot, so a low score only
+    means "ask the LLM".
+
+    Args:
+        text: The text to extract from (e.g. only the new messages of a session)
+        known: Intelligence already gathered earlier in the session; counts
+            towards the score but is not returned again
+
+    Returns:
+        {
+            "is_scam": bool,
+            "confidence": float,
+            "agent_notes": str,
+            "extracted_data": Dict[str, List[str]]
+        }
+    """
+    extracted = extract(text)
+    evidence = extracted
+    if known:
+        evidence = {key: set(values).union(known.get(key, ())) for key, values in extracted.items()}
+    confidence = score(evidence)
+
+    found = [label for key, label in ENTITY_LABELS.items() if evidence.get(key)]
+    notes = "Rule-based analysis."
+    if found:
+        notes += f" Scammer shared {', '.join(found)}."
+    if evidence["suspiciousKeywords"]:
+        keywords = sorted({keyword.lower() for keyword in evidence["suspiciousKeywords"]})
+        notes += f" Pressure keywords: {', '.join(keywords)}."
+
+    return {
+        "is_scam": confidence >= 0.5,
+        "confidence": confidence,
+        "agent_notes": notes,
+        "extracted_data": extracted
+    }
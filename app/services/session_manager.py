@@ -1,55 +1,164 @@
 """
 Session Manager - In-Memory Session Tracking
 Handles session state, metrics calculation, and final callback triggering logic.
+Sessions live in a bounded LRU store with idle-TTL expiry driven by a background sweeper,
+which also acts as a read-through cache in front of an optional persistent repository.
 """
 
+import asyncio
+import sys
 import time
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+from app.core.logging import get_logger
 from app.models.schemas import ConversationMessage, ExtractedIntelligence
+from app.services.session_store import SessionRepository, create_session_repository
+
+logger = get_logger(__name__)
+
+# Agent notes kept per session (only the latest is ever read)
+NOTES_KEPT = max(1, settings.SESSION_NOTES_KEPT)
+
+# Reload-merge-retry rounds when another worker saves the same session concurrently
+SAVE_ATTEMPTS = 3
+
+# Session attribute for each ExtractedIntelligence field
+INTELLIGENCE_FIELDS = (
+    ("bankAccounts", "bank_accounts"),
+    ("upiIds", "upi_ids"),
+    ("phishingLinks", "phishing_links"),
+    ("phoneNumbers", "phone_numbers"),
+    ("suspiciousKeywords", "suspicious_keywords")
+)
+
+class EntityTable:
+    """
+    Shared table of entity strings (UPI IDs, phone numbers, links, keywords).
+
+    Scam scripts repeat the same handful of payment details across many sessions;
+    interning them here means each distinct value is stored once, however many
+    sessions hold it. Bounded: past max_entries new values are simply not shared.
+    """
+
+    def __init__(self, max_entries: int = settings.SESSION_ENTITY_TABLE_MAX):
+        self.max_entries = max_entries
+        self._table: Dict[str, str] = {}
+
+    def intern(self, value: str) -> str:
+        shared = self._table.get(value)
+        if shared is not None:
+            return shared
+        if len(self._table) < self.max_entries:
+            self._table[value] = value
+        return value
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._table),
+            "approx_memory_bytes": sys.getsizeof(self._table) + sum(sys.getsizeof(value) for value in self._table)
+        }
+
+
+entity_table = EntityTable()
 
 class SessionData:
-    """Data structure for tracking a single session"""
+    """
+    Data structure for tracking a single session.
+
+    Kept small because there can be hundreds of thousands of them: __slots__
+    instead of a per-instance __dict__, intelligence as tuples of strings interned
+    in the shared entity_table (an empty tuple is free, an empty set is 216 bytes),
+    only the last SESSION_NOTES_KEPT agent notes, and the messages themselves only
+    with SESSION_KEEP_HISTORY (the client resends them every turn; message_count
+    is always kept).
+    """
+    __slots__ = (
+        "session_id", "start_time", "last_activity", "message_count", "scam_detected",
+        "conversation_history", "bank_accounts", "upi_ids", "phishing_links", "phone_numbers",
+        "suspicious_keywords", "agent_notes_history", "extraction_watermark", "rolling_summary",
+        "summarized_count", "final_callback_sent", "intelligence_extracted_count", "version",
+        "model_notes", "saved_message_count"
+    )
+
     def __init__(self, session_id: str):
         self.session_id = session_id
         self.start_time = time.time()
+        self.last_activity = self.start_time
         self.message_count = 0
         self.scam_detected = False
-        self.conversation_history: List[Dict[str, str]] = []
+        # (sender, text) pairs, or None when history is not retained
+        self.conversation_history: Optional[List[Tuple[str, str]]] = [] if settings.SESSION_KEEP_HISTORY else None
+        
+        # Accumulated intelligence (unique values in the order they were found)
+        self.bank_accounts: Tuple[str, ...] = ()
+        self.upi_ids: Tuple[str, ...] = ()
+        self.phishing_links: Tuple[str, ...] = ()
+        self.phone_numbers: Tuple[str, ...] = ()
+        self.suspicious_keywords: Tuple[str, ...] = ()
         
-        # Accumulated intelligence
-        self.bank_accounts = set()
-        self.upi_ids = set()
-        self.phishing_links = set()
-        self.phone_numbers = set()
-        self.suspicious_keywords = set()
+        # Latest agent notes, newest last (at most SESSION_NOTES_KEPT)
+        self.agent_notes_history: Tuple[str, ...] = ()
+        # The model's own running summary, from the last LLM (or fused) analysis;
+        # the rule and regex tiers' canned notes never replace it
+        self.model_notes = ""
         
-        # Agent notes accumulation
-        self.agent_notes_history: List[str] = []
+        # How many conversationHistory messages have already been scanned for
+        # intelligence, so each turn only extracts from what is new
+        self.extraction_watermark = 0
+        
+        # Older turns folded out of the prompt window, and how many history
+        # messages the summary covers (see context_manager)
+        self.rolling_summary = ""
+        self.summarized_count = 0
         
         # Final callback tracking
         self.final_callback_sent = False
         self.intelligence_extracted_count = 0  # Track how much intel we've gathered
+        
+        # Bumped on every save to the session repository; saved_message_count is
+        # message_count as of that stored version, so a merge can tell which
+        # messages this copy added
+        self.version = 0
+        self.saved_message_count = 0
 
     def add_message(self, sender: str, text: str):
-        """Add a message to the conversation history"""
-        self.conversation_history.append({
-            "sender": sender,
-            "text": text
-        })
+        """Count a message (and keep it, if history retention is on)"""
+        if self.conversation_history is not None:
+            self.conversation_history.append((sender, text))
         self.message_count += 1
 
-    def update_intelligence(self, intelligence: ExtractedIntelligence, agent_notes: str):
-        """Update accumulated intelligence from latest analysis"""
-        # Add new findings to sets (automatically deduplicates)
-        self.bank_accounts.update(intelligence.bankAccounts)
-        self.upi_ids.update(intelligence.upiIds)
-        self.phishing_links.update(intelligence.phishingLinks)
-        self.phone_numbers.update(intelligence.phoneNumbers)
-        self.suspicious_keywords.update(intelligence.suspiciousKeywords)
+    def _add_values(self, attribute: str, values: Iterable[str]) -> Tuple[str, ...]:
+        current = getattr(self, attribute)
+        added = tuple(entity_table.intern(value) for value in dict.fromkeys(values) if value not in current)
+        if added:
+            setattr(self, attribute, current + added)
+        return added
+
+    def update_intelligence(
+        self, intelligence: ExtractedIntelligence, agent_notes: str, from_model: bool = True
+    ) -> Dict[str, Tuple[str, ...]]:
+        """
+        Update accumulated intelligence from latest analysis.
+        from_model is False for analyses that did not come from the LLM (rules,
+        regex, near-duplicates): their notes are kept in the history but do not
+        replace model_notes.
+        Returns the values that are new to this session, keyed like ExtractedIntelligence.
+        """
+        # Add new findings (deduplicated against what the session already has)
+        added = {
+            field: self._add_values(attribute, getattr(intelligence, field))
+            for field, attribute in INTELLIGENCE_FIELDS
+        }
         
         # Track agent notes
         if agent_notes:
-            self.agent_notes_history.append(agent_notes)
+            self.agent_notes_history = (self.agent_notes_history + (agent_notes,))[-NOTES_KEPT:]
+            if from_model:
+                self.model_notes = agent_notes
         
         # Count total intelligence items
         self.intelligence_extracted_count = (
@@ -58,6 +167,119 @@ class SessionData:
             len(self.phishing_links) + 
             len(self.phone_numbers)
         )
+        return added
+
+    def mark_extracted(self, history_length: int):
+        """Record that the first history_length history messages have been scanned"""
+        self.extraction_watermark = history_length
+
+    def get_latest_agent_notes(self) -> Optional[str]:
+        """The model's running summary from the most recent LLM analysis, if any"""
+        return self.model_notes or None
+
+    def get_intelligence_values(self) -> Dict[str, Tuple[str, ...]]:
+        """Accumulated intelligence (unique values), keyed like ExtractedIntelligence"""
+        return {field: getattr(self, attribute) for field, attribute in INTELLIGENCE_FIELDS}
+
+    def to_dict(self) -> Dict:
+        """Serializable snapshot of the session, for the session repository"""
+        return {
+            "session_id": self.session_id,
+            "version": self.version,
+            "start_time": self.start_time,
+            "last_activity": self.last_activity,
+            "message_count": self.message_count,
+            "scam_detected": self.scam_detected,
+            "conversation_history": [
+                {"sender": sender, "text": text} for sender, text in self.conversation_history or ()
+            ],
+            "intelligence": {key: list(values) for key, values in self.get_intelligence_values().items()},
+            "agent_notes_history": list(self.agent_notes_history),
+            "model_notes": self.model_notes,
+            "extraction_watermark": self.extraction_watermark,
+            "rolling_summary": self.rolling_summary,
+            "summarized_count": self.summarized_count,
+            "final_callback_sent": self.final_callback_sent,
+            "intelligence_extracted_count": self.intelligence_extracted_count
+        }
+
+    @classmethod
+    def from_dict(cls, record: Dict) -> "SessionData":
+        """Rebuild a session from a to_dict() snapshot (older snapshots included)"""
+        session = cls(record["session_id"])
+        session.version = record["version"]
+        session.start_time = record["start_time"]
+        session.last_activity = record["last_activity"]
+        session.message_count = record["message_count"]
+        session.saved_message_count = record["message_count"]
+        session.scam_detected = record["scam_detected"]
+        if session.conversation_history is not None:
+            session.conversation_history = [
+                (message["sender"], message["text"]) for message in record["conversation_history"]
+            ]
+        for field, attribute in INTELLIGENCE_FIELDS:
+            session._add_values(attribute, record["intelligence"].get(field, ()))
+        session.agent_notes_history = tuple(record["agent_notes_history"][-NOTES_KEPT:])
+        session.model_notes = record.get("model_notes", "")
+        session.extraction_watermark = record["extraction_watermark"]
+        session.rolling_summary = record.get("rolling_summary", "")
+        session.summarized_count = record.get("summarized_count", 0)
+        session.final_callback_sent = record["final_callback_sent"]
+        session.intelligence_extracted_count = record["intelligence_extracted_count"]
+        return session
+
+    def merge(self, stored: "SessionData"):
+        """
+        Fold in a newer stored copy that another worker saved while this one was
+        being updated: intelligence is unioned, flags are OR-ed, the messages this
+        copy added since it was loaded are added to the stored message_count, and
+        the watermark takes the larger value. Our agent notes stay (they are the latest).
+        """
+        self.version = stored.version
+        self.start_time = min(self.start_time, stored.start_time)
+        self.last_activity = max(self.last_activity, stored.last_activity)
+        self.message_count = stored.message_count + (self.message_count - self.saved_message_count)
+        self.saved_message_count = stored.message_count
+        self.scam_detected = self.scam_detected or stored.scam_detected
+        self.final_callback_sent = self.final_callback_sent or stored.final_callback_sent
+        if self.conversation_history is not None and len(stored.conversation_history) > len(self.conversation_history):
+            self.conversation_history = stored.conversation_history
+        for _, attribute in INTELLIGENCE_FIELDS:
+            self._add_values(attribute, getattr(stored, attribute))
+        if not self.agent_notes_history:
+            self.agent_notes_history = stored.agent_notes_history
+        if not self.model_notes:
+            self.model_notes = stored.model_notes
+        self.extraction_watermark = max(self.extraction_watermark, stored.extraction_watermark)
+        if stored.summarized_count > self.summarized_count:
+            self.rolling_summary = stored.rolling_summary
+            self.summarized_count = stored.summarized_count
+        self.intelligence_extracted_count = (
+            len(self.bank_accounts) + len(self.upi_ids) + len(self.phishing_links) + len(self.phone_numbers)
+        )
+
+    def touch(self):
+        """Record activity on this session (resets its idle timer)"""
+        self.last_activity = time.time()
+
+    def approx_size_bytes(self) -> int:
+        """
+        Rough memory footprint of this session: the object plus the strings it holds.
+        Entity strings are shared through entity_table and not counted per session.
+        Used for the session store's memory limit, not exact accounting.
+        """
+        size = sys.getsizeof(self) + sys.getsizeof(self.session_id)
+        for _, attribute in INTELLIGENCE_FIELDS:
+            size += sys.getsizeof(getattr(self, attribute))
+        if self.conversation_history is not None:
+            size += sys.getsizeof(self.conversation_history)
+            for message in self.conversation_history:
+                size += sys.getsizeof(message) + sys.getsizeof(message[1])
+        size += sys.getsizeof(self.agent_notes_history)
+        size += sum(sys.getsizeof(note) for note in self.agent_notes_history)
+        size += sys.getsizeof(self.model_notes)
+        size += sys.getsizeof(self.rolling_summary)
+        return size
 
     def get_duration_seconds(self) -> int:
         """Calculate engagement duration in seconds"""
@@ -78,8 +300,9 @@ class SessionData:
         if not self.agent_notes_history:
             return "Session completed with scam engagement."
         
-        # Use the most recent note as primary, with summary
-        latest_note = self.agent_notes_history[-1]
+        # Use the model's running summary as primary (the latest rule/regex note
+        # only when the model never analyzed this session), with summary
+        latest_note = self.model_notes or self.agent_notes_history[-1]
         intel_summary = f"Extracted {self.intelligence_extracted_count} intelligence items across {self.message_count} messages."
         
         return f"{latest_note} {intel_summary}"
@@ -111,45 +334,243 @@ class SessionData:
 
 
 class SessionManager:
-    """Manages all active sessions in memory"""
+    """
+    Manages all active sessions in memory.
+    
+    Sessions are kept in least-recently-active order, so:
+    - the entry limit and the memory limit evict from the front (LRU)
+    - idle expiry only ever looks at the front: each expired session costs O(1)
+      and the sweep stops at the first session that is still fresh
     
-    def __init__(self):
-        self._sessions: Dict[str, SessionData] = {}
+    With a persistent repository the in-memory store is a read-through cache:
+    each lookup compares the cached version with the stored one (a primary-key
+    read) and reloads if another worker has saved the session since.
+    """
+    
+    def __init__(
+        self,
+        max_sessions: int = settings.SESSION_MAX_ENTRIES,
+        max_memory_bytes: int = settings.SESSION_MAX_MEMORY_MB * 1024 * 1024,
+        idle_ttl_seconds: float = settings.SESSION_IDLE_TTL_SECONDS,
+        repository: Optional[SessionRepository] = None
+    ):
+        self.repository = repository or SessionRepository()
+        self._sessions: "OrderedDict[str, SessionData]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self.max_sessions = max_sessions
+        self.max_memory_bytes = max_memory_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.evicted_count = 0
+        self.expired_count = 0
+        self._sweeper_task: Optional[asyncio.Task] = None
     
     def get_or_create_session(self, session_id: str) -> SessionData:
-        """Get existing session or create new one"""
-        if session_id not in self._sessions:
-            self._sessions[session_id] = SessionData(session_id)
-        return self._sessions[session_id]
+        """Get existing session or create new one. Either way it becomes the most recent."""
+        session = self._sessions.get(session_id)
+        if self.repository.persistent:
+            stored_version = self.repository.get_version(session_id)
+            if self._is_stale(session, stored_version):
+                session = self._cache_loaded(session, self.repository.load(session_id))
+        return self._admit(session_id, session)
+    
+    async def get_or_create_session_async(self, session_id: str) -> SessionData:
+        """get_or_create_session with the repository reads on a worker thread, off the event loop"""
+        session = self._sessions.get(session_id)
+        if self.repository.persistent:
+            stored_version = await asyncio.to_thread(self.repository.get_version, session_id)
+            if self._is_stale(session, stored_version):
+                record = await asyncio.to_thread(self.repository.load, session_id)
+                session = self._cache_loaded(session, record)
+        return self._admit(session_id, session)
+    
+    @staticmethod
+    def _is_stale(cached: Optional[SessionData], stored_version: Optional[int]) -> bool:
+        """Whether the repository has a version of the session the cache doesn't"""
+        return stored_version is not None and (cached is None or cached.version != stored_version)
+    
+    def _cache_loaded(self, cached: Optional[SessionData], record: Optional[Dict]) -> Optional[SessionData]:
+        """Replace the cached session with a freshly loaded record (if it still exists)"""
+        if record is None:
+            return cached
+        session = SessionData.from_dict(record)
+        self._sessions[session.session_id] = session
+        self._set_size(session)
+        return session
+    
+    def _admit(self, session_id: str, session: Optional[SessionData]) -> SessionData:
+        if session is None:
+            session = SessionData(session_id)
+            self._sessions[session_id] = session
+            self._set_size(session)
+        self._sessions.move_to_end(session_id)
+        self._enforce_limits()
+        session.touch()
+        return session
     
     def get_session(self, session_id: str) -> Optional[SessionData]:
         """Get session if it exists"""
         return self._sessions.get(session_id)
     
+    def save_session(self, session: SessionData):
+        """
+        Persist a session once at the end of a turn (all of the turn's changes in
+        one write), then re-measure it against the memory limit.
+        
+        The write only succeeds on top of the version this session was loaded at;
+        if another worker saved in between, its copy is reloaded and merged in
+        (see SessionData.merge) and the write is retried.
+        """
+        if self.repository.persistent:
+            for _ in range(SAVE_ATTEMPTS):
+                record = self._next_record(session)
+                if self.repository.save(record):
+                    session.version = record["version"]
+                    session.saved_message_count = record["message_count"]
+                    break
+                self._merge_stored(session, self.repository.load(session.session_id))
+            else:
+                self._save_failed(session)
+        self._resize(session)
+    
+    async def save_session_async(self, session: SessionData):
+        """save_session with the repository calls on a worker thread, off the event loop"""
+        if self.repository.persistent:
+            for _ in range(SAVE_ATTEMPTS):
+                record = self._next_record(session)
+                if await asyncio.to_thread(self.repository.save, record):
+                    session.version = record["version"]
+                    session.saved_message_count = record["message_count"]
+                    break
+                self._merge_stored(session, await asyncio.to_thread(self.repository.load, session.session_id))
+            else:
+                self._save_failed(session)
+        self._resize(session)
+    
+    @staticmethod
+    def _next_record(session: SessionData) -> Dict:
+        # The version is only bumped once the write succeeds: a concurrent turn of
+        # this worker may be saving the same object
+        record = session.to_dict()
+        record["version"] = session.version + 1
+        return record
+    
+    @staticmethod
+    def _merge_stored(session: SessionData, record: Optional[Dict]):
+        if record is None:
+            session.version = 0  # deleted (expired) meanwhile: store it afresh
+        else:
+            session.merge(SessionData.from_dict(record))
+    
+    @staticmethod
+    def _save_failed(session: SessionData):
+        logger.warning("Session save kept losing to concurrent writers, giving up", extra={
+            "version": session.version, "attempts": SAVE_ATTEMPTS
+        })
+    
+    def _resize(self, session: SessionData):
+        if session.session_id in self._sessions:
+            self._set_size(session)
+            self._enforce_limits()
+    
     def mark_callback_sent(self, session_id: str):
         """Mark that final callback has been sent for this session"""
         session = self.get_session(session_id)
         if session:
             session.final_callback_sent = True
     
+    def _set_size(self, session: SessionData):
+        size = session.approx_size_bytes()
+        self._total_bytes += size - self._sizes.get(session.session_id, 0)
+        self._sizes[session.session_id] = size
+    
+    def _remove_oldest(self) -> SessionData:
+        session_id, session = self._sessions.popitem(last=False)
+        self._total_bytes -= self._sizes.pop(session_id, 0)
+        return session
+    
+    def _enforce_limits(self):
+        """Evict least recently active sessions until within both limits (always keeps the newest)"""
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self._total_bytes > self.max_memory_bytes
+        ):
+            self._remove_oldest()
+            self.evicted_count += 1
+    
+    def sweep_expired(self, idle_ttl_seconds: Optional[float] = None) -> int:
+        """
+        Remove sessions idle for longer than idle_ttl_seconds (default: the store's TTL).
+        
+        Returns:
+            Number of sessions removed
+        """
+        cutoff = self._expiry_cutoff(idle_ttl_seconds)
+        removed = self._expire_cached(cutoff)
+        # Stored sessions may not be in this worker's cache, so expire them by timestamp
+        self.repository.delete_idle(cutoff)
+        return removed
+    
+    def _expiry_cutoff(self, idle_ttl_seconds: Optional[float]) -> float:
+        ttl = self.idle_ttl_seconds if idle_ttl_seconds is None else idle_ttl_seconds
+        return time.time() - ttl
+    
+    def _expire_cached(self, cutoff: float) -> int:
+        removed = 0
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_activity > cutoff:
+                break
+            self._remove_oldest()
+            removed += 1
+        self.expired_count += removed
+        return removed
+    
     def cleanup_old_sessions(self, max_age_seconds: int = 3600):
         """
-        Clean up sessions older than max_age_seconds.
-        Call this periodically to prevent memory bloat.
+        Clean up sessions idle for more than max_age_seconds.
+        The background sweeper does this periodically; kept for manual use.
         """
-        current_time = time.time()
-        sessions_to_remove = []
-        
-        for session_id, session in self._sessions.items():
-            if current_time - session.start_time > max_age_seconds:
-                sessions_to_remove.append(session_id)
-        
-        for session_id in sessions_to_remove:
-            del self._sessions[session_id]
-        
-        if sessions_to_remove:
-            print(f"🧹 Cleaned up {len(sessions_to_remove)} old sessions")
+        removed = self.sweep_expired(max_age_seconds)
+        if removed:
+            logger.info("Cleaned up old sessions", extra={"removed": removed})
+    
+    def stats(self) -> Dict[str, int]:
+        """Current store size and eviction counters"""
+        return {
+            "active_sessions": len(self._sessions),
+            "approx_memory_bytes": self._total_bytes,
+            "evicted": self.evicted_count,
+            "expired": self.expired_count,
+            "entity_table_entries": len(entity_table)
+        }
+    
+    async def _sweep_loop(self, interval_seconds: float):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            cutoff = self._expiry_cutoff(None)
+            removed = self._expire_cached(cutoff)
+            if self.repository.persistent:
+                await asyncio.to_thread(self.repository.delete_idle, cutoff)
+            if removed:
+                logger.info("Cleaned up old sessions", extra={"removed": removed})
+    
+    def start_sweeper(self, interval_seconds: float = settings.SESSION_SWEEP_INTERVAL_SECONDS):
+        """Start the background idle-expiry task. Called from the application lifespan."""
+        if self._sweeper_task is None:
+            self._sweeper_task = asyncio.create_task(self._sweep_loop(interval_seconds))
+    
+    async def stop_sweeper(self):
+        """Stop the background idle-expiry task"""
+        if self._sweeper_task is not None:
+            self._sweeper_task.cancel()
+            try:
+                await self._sweeper_task
+            except asyncio.CancelledError:
+                pass
+            self._sweeper_task = None
 
 
 # Global session manager instance
-session_manager = SessionManager()
+session_manager = SessionManager(
+    repository=create_session_repository(settings.SESSION_BACKEND, settings.SESSION_DB_PATH)
+)
@@ -0,0 +1,125 @@
+"""
+Session Store - Pluggable Session Persistence
+Repositories that keep session state outside the process, so sessions survive
+restarts and stay coherent when several uvicorn workers serve the same sessionId.
+The SessionManager's in-memory store acts as a read-through cache in front of them.
+"""
+
+import json
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+class SessionRepository:
+    """
+    Base repository: sessions live only in the process (the original behaviour).
+
+    Records are plain dicts produced by SessionData.to_dict(); each save bumps
+    the record's version so other workers can tell their cached copy is stale.
+    Repository calls block (SQLite waits up to its busy timeout for a writer), so
+    the API makes them on a worker thread (see SessionManager's *_async methods).
+    """
+    persistent = False
+
+    def get_version(self, session_id: str) -> Optional[int]:
+        """Stored version of a session, or None if it is not stored"""
+        return None
+
+    def load(self, session_id: str) -> Optional[Dict]:
+        """Stored record of a session, or None if it is not stored"""
+        return None
+
+    def save(self, record: Dict) -> bool:
+        """
+        Write one session record (one write per turn) if the stored version is the
+        one before it, or the session is not stored. Returns False if another
+        worker saved that version first (the caller reloads, merges and retries).
+        """
+        return True
+
+    def delete_idle(self, cutoff: float) -> int:
+        """Delete sessions whose last activity is before cutoff. Returns how many."""
+        return 0
+
+    def close(self):
+        """Release resources"""
+
+
+class SQLiteSessionRepository(SessionRepository):
+    """
+    SQLite in WAL mode: readers never block the writer and several worker
+    processes can share one database file on the same host.
+    """
+    persistent = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        with self._lock:
+            self._db()
+
+    def _db(self) -> sqlite3.Connection:
+        """The open connection; (re)opened on first use after close(). Lock held."""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " session_id TEXT PRIMARY KEY,"
+                " version INTEGER NOT NULL,"
+                " last_activity REAL NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_sessions_last_activity ON sessions (last_activity)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def get_version(self, session_id: str) -> Optional[int]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT version FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT data FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, record: Dict) -> bool:
+        data = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            cursor = self._db().execute(
+                "INSERT INTO sessions (session_id, version, last_activity, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET "
+                "version = excluded.version, last_activity = excluded.last_activity, data = excluded.data "
+                "WHERE sessions.version = excluded.version - 1",
+                (record["session_id"], record["version"], record["last_activity"], data)
+            )
+        return cursor.rowcount > 0
+
+    def delete_idle(self, cutoff: float) -> int:
+        with self._lock:
+            cursor = self._db().execute("DELETE FROM sessions WHERE last_activity < ?", (cutoff,))
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def create_session_repository(backend: str, db_path: str) -> SessionRepository:
+    """Build the repository selected by config ("memory" or "sqlite")"""
+    if backend == "memory":
+        return SessionRepository()
+    if backend == "sqlite":
+        return SQLiteSessionRepository(db_path)
+    raise ValueError(f"Unknown session backend: {backend}")
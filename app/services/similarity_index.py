@@ -0,0 +1,140 @@
+"""
+Similarity Index - Near-Duplicate Cache for Intelligence Analysis
+MinHash signatures over character n-grams with LSH banding, so a scammer message
+that is a copy of an already analyzed template reuses its verdict.
+"""
+
+import random
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.services.reply_cache import normalize
+
+_MASK_64 = (1 << 64) - 1
+
+def shingles(text: str, size: int) -> set:
+    """Character n-grams of the normalized text"""
+    text = normalize(text)
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class SimilarityIndex:
+    """
+    MinHash + LSH index of analyzed messages.
+
+    Each message gets a num_perm MinHash signature; signatures are split into
+    `bands` bands and bucketed per band, so a lookup only compares against
+    messages that share at least one band. A candidate counts as a match when
+    the estimated Jaccard similarity (fraction of equal signature slots)
+    reaches `threshold`. Bounded LRU, like the session store.
+    """
+
+    def __init__(
+        self,
+        threshold: float = settings.SIMILARITY_THRESHOLD,
+        max_entries: int = settings.SIMILARITY_MAX_ENTRIES,
+        num_perm: int = settings.SIMILARITY_NUM_PERM,
+        bands: int = settings.SIMILARITY_BANDS,
+        shingle_size: int = settings.SIMILARITY_SHINGLE_SIZE,
+        min_chars: int = settings.SIMILARITY_MIN_CHARS
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_chars = min_chars
+
+        # Multiply-shift hash family h(x) = ((a*x + b) mod 2^64) >> 32 with odd a,
+        # drawn from a fixed seed so signatures are stable across processes
+        rng = random.Random(1)
+        self._coefficients = [rng.getrandbits(64) | 1 for _ in range(num_perm)]
+        self._offsets = [rng.getrandbits(64) for _ in range(num_perm)]
+
+        self._entries: "OrderedDict[int, Tuple[Tuple[int, ...], Dict]]" = OrderedDict()
+        self._buckets: List[Dict[Tuple[int, ...], set]] = [{} for _ in range(bands)]
+        self._next_id = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text, self.shingle_size)]
+        return tuple(
+            min([(a * h + b) & _MASK_64 for h in hashes]) >> 32
+            for a, b in zip(self._coefficients, self._offsets)
+        )
+
+    def _band_keys(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def _indexable(self, text: str) -> bool:
+        return len(text.strip()) >= self.min_chars
+
+    def lookup(self, text: str) -> Optional[Dict]:
+        """The stored result of the most similar indexed message, or None"""
+        if not self._indexable(text):
+            return None
+        signature = self.signature(text)
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        best_id, best_similarity = None, 0.0
+        for entry_id in candidates:
+            other = self._entries[entry_id][0]
+            similarity = sum(x == y for x, y in zip(signature, other)) / self.num_perm
+            if similarity > best_similarity:
+                best_id, best_similarity = entry_id, similarity
+
+        if best_id is None or best_similarity < self.threshold:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(best_id)
+        self.hits += 1
+        return self._entries[best_id][1]
+
+    def add(self, text: str, result: Dict):
+        """Index a message with its analysis result (e.g. {"is_scam": True})"""
+        if not self._indexable(text):
+            return
+        signature = self.signature(text)
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (signature, result)
+        for band, key in self._band_keys(signature):
+            self._buckets[band].setdefault(key, set()).add(entry_id)
+        while len(self._entries) > self.max_entries:
+            self._remove_oldest()
+
+    def _remove_oldest(self):
+        entry_id, (signature, _) = self._entries.popitem(last=False)
+        for band, key in self._band_keys(signature):
+            bucket = self._buckets[band][key]
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[band][key]
+        self.evictions += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+
+# Global instance (None when disabled)
+similarity_index: Optional[SimilarityIndex] = SimilarityIndex() if settings.SIMILARITY_CACHE_ENABLED else None
@@ -0,0 +1,238 @@
+"""
+Chat Load Test / Benchmark
+Drives /api/v1/chat with many concurrent multi-turn scam sessions and reports
+throughput, latency percentiles and session memory. By default the app runs in
+process (httpx ASGI transport, fake LLM backend with configurable latency, callbacks
+answered locally), so results are reproducible without keys or a server.
+
+Run with:
+    python bench_chat.py [--sessions 200] [--turns 6] [--concurrency 50] [--latency-ms 50]
+    python bench_chat.py --save             # write the baseline JSON
+    python bench_chat.py --url http://127.0.0.1:8000 --api-key <key>   # live server
+
+Compares against the baseline (bench_chat_baseline.json) when it exists and exits
+with status 1 if throughput or p99 latency regressed by more than --tolerance, or
+if more turns fell back to a canned persona reply than --fallback-tolerance allows.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+try:
+    import resource  # POSIX only: peak RSS is not reported on Windows
+except ImportError:
+    resource = None
+
+FRAGMENTS = [
+    "Hello sir, your bank account has been blocked due to suspicious activity.",
+    "You need to verify your account immediately or it will be permanently closed.",
+    "Send Rs. 100 verification fee to scammer{n}@paytm now.",
+    "Call me at +91 98765{n:05d} if you have any issues.",
+    "Transfer to account number 1234567{n:05d} urgently.",
+    "Click this link to verify: http://fake-bank{n}.com/verify?id={n}",
+    "Why are you not answering? This is your last warning.",
+    "Pay to 98{n:08d}@ybl and share the OTP.",
+    "KYC update pending, action required before 5pm. Call +919{n:09d}",
+    "ok fine",
+]
+
+
+def percentile(ordered, p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+async def run_session(client, session_id: str, turns: int, api_key: str, rng: random.Random, latencies, statuses):
+    history = []
+    for _ in range(turns):
+        text = rng.choice(FRAGMENTS).format(n=rng.randint(0, 99999))
+        body = {"sessionId": session_id, "message": {"text": text}, "conversationHistory": history}
+        started = time.perf_counter()
+        try:
+            response = await client.post("/api/v1/chat", json=body, headers={"x-api-key": api_key})
+        except Exception:
+            statuses["error"] = statuses.get("error", 0) + 1
+            continue
+        latencies.append(time.perf_counter() - started)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+        if response.status_code != 200:
+            continue
+        result = response.json()
+        statuses["tier:" + result.get("analysisTier", "?")] = statuses.get("tier:" + result.get("analysisTier", "?"), 0) + 1
+        history += [{"sender": "scammer", "text": text}, {"sender": "user", "text": result["reply"]}]
+
+
+async def reply_fallbacks(client) -> dict:
+    """honeypot_reply_fallbacks_total per reason, scraped from /metrics"""
+    from prometheus_client.parser import text_string_to_metric_families
+    response = await client.get("/metrics")
+    counts = {}
+    for family in text_string_to_metric_families(response.text):
+        if family.name == "honeypot_reply_fallbacks":
+            for sample in family.samples:
+                if sample.name == "honeypot_reply_fallbacks_total":
+                    counts[sample.labels["reason"]] = int(sample.value)
+    return counts
+
+
+async def run_load(client, args, api_key: str):
+    latencies, statuses = [], {}
+    fallbacks_before = await reply_fallbacks(client)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    rng = random.Random(args.seed)
+
+    async def session(i: int):
+        async with semaphore:
+            await run_session(client, f"bench-{i}", args.turns, api_key, random.Random(rng.random()), latencies, statuses)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(args.sessions)))
+    elapsed = time.perf_counter() - started
+    for reason, count in (await reply_fallbacks(client)).items():
+        statuses[f"fallback:{reason}"] = count - fallbacks_before.get(reason, 0)
+    return elapsed, latencies, statuses
+
+
+async def bench_in_process(args):
+    # Settings are read at import time, so configure the app before importing it
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+    os.environ.setdefault("YOUR_SECRET_API_KEY", "bench-key")
+    os.environ.setdefault("GUVI_CALLBACK_URL", "http://callback.invalid/final")
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["FAKE_LLM_JITTER_MS"] = str(args.jitter_ms)
+    os.environ["FAKE_LLM_FAILURE_RATE"] = str(args.failure_rate)
+    os.environ["SESSION_BACKEND"] = "memory"
+    os.environ["CALLBACK_OUTBOX_DIR"] = tempfile.mkdtemp(prefix="bench_outbox_")
+
+    import httpx
+    from app.core.config import settings
+    from app.main import app
+    from app.services.llm_backend import get_backend
+    from app.services.reporting import callback_dispatcher
+    from app.services.session_manager import session_manager
+
+    # Answer final callbacks locally instead of calling the evaluation endpoint
+    callback_dispatcher.transport = httpx.MockTransport(lambda request: httpx.Response(200))
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+            elapsed, latencies, statuses = await run_load(client, args, settings.YOUR_SECRET_API_KEY)
+        store = session_manager.stats()
+    bytes_per_session = store["approx_memory_bytes"] / store["active_sessions"] if store["active_sessions"] else 0
+    backend = getattr(get_backend(), "stats", None)
+    if backend:
+        # Calls shed by the circuit breaker / concurrency limit show up as fallback tiers
+        llm = backend()
+        for key in ("calls", "failures", "rejected_limit", "rejected_open", "waited"):
+            statuses[f"llm:{key}"] = llm[key]
+    return elapsed, latencies, statuses, bytes_per_session
+
+
+async def bench_live(args):
+    import httpx
+    async with httpx.AsyncClient(base_url=args.url, timeout=30) as client:
+        elapsed, latencies, statuses = await run_load(client, args, args.api_key)
+    return elapsed, latencies, statuses, None
+
+
+def summarize(args, elapsed, latencies, statuses, bytes_per_session) -> dict:
+    ordered = sorted(latencies) or [0.0]
+    fallbacks = sum(count for key, count in statuses.items() if key.startswith("fallback:"))
+    return {
+        "config": {
+            "mode": "live" if args.url else "in_process",
+            "sessions": args.sessions,
+            "turns": args.turns,
+            "concurrency": args.concurrency,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "failure_rate": args.failure_rate
+        },
+        "requests": len(latencies),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(ordered, 0.50) * 1000, 1),
+            "p90": round(percentile(ordered, 0.90) * 1000, 1),
+            "p99": round(percentile(ordered, 0.99) * 1000, 1),
+            "max": round(ordered[-1] * 1000, 1)
+        },
+        "statuses": dict(sorted(statuses.items())),
+        "reply_fallback_rate": round(fallbacks / len(latencies), 4) if latencies else 0.0,
+        "approx_bytes_per_session": round(bytes_per_session) if bytes_per_session is not None else None,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource else None
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float, fallback_tolerance: float) -> bool:
+    """
+    Print the change against the baseline; False if throughput or p99 regressed
+    beyond tolerance, or the share of canned persona replies grew by more than
+    fallback_tolerance (absolute: a baseline of 0 has no relative change).
+    """
+    if baseline.get("config") != result["config"]:
+        print("Baseline was recorded with a different configuration, not comparing.")
+        return True
+    ok = True
+    checks = [
+        ("throughput_rps", result["throughput_rps"], baseline["throughput_rps"], True),
+        ("p99 latency ms", result["latency_ms"]["p99"], baseline["latency_ms"]["p99"], False)
+    ]
+    for name, current, previous, higher_is_better in checks:
+        change = (current - previous) / previous if previous else 0.0
+        regressed = -change > tolerance if higher_is_better else change > tolerance
+        ok = ok and not regressed
+        print(f"{name:>16}: {previous} -> {current} ({change:+.1%}){'  REGRESSION' if regressed else ''}")
+    current, previous = result["reply_fallback_rate"], baseline.get("reply_fallback_rate", 0.0)
+    regressed = current - previous > fallback_tolerance
+    ok = ok and not regressed
+    print(f"{'fallback rate':>16}: {previous:.2%} -> {current:.2%}{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=6, help="Scammer messages per session")
+    parser.add_argument("--concurrency", type=int, default=50, help="Sessions in flight at once")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Fake LLM latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of fake LLM calls that fail")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--api-key", default=os.environ.get("YOUR_SECRET_API_KEY", ""))
+    parser.add_argument("--baseline", default="bench_chat_baseline.json")
+    parser.add_argument("--save", action="store_true", help="Write the result as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--fallback-tolerance", type=float, default=0.01,
+                        help="Allowed increase in the share of turns answered with a canned reply")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("CHAT LOAD TEST")
+    print("=" * 60)
+    runner = bench_live if args.url else bench_in_process
+    result = summarize(args, *asyncio.run(runner(args)))
+    print(json.dumps(result, indent=2))
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if not compare(result, baseline, args.tolerance, args.fallback_tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
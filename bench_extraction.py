@@ -0,0 +1,84 @@
+"""
+Extraction Microbenchmark
+Measures rule_engine.extract throughput (MB/s) on long transcripts and compares it
+with the previous five-scan implementation. Also checks both return the same entities.
+
+Run with:
+    python bench_extraction.py [--sizes 10,100,1000] [--repeat 5]
+"""
+
+import argparse
+import random
+import re
+import time
+from app.services import rule_engine
+
+# The previous implementation: five independent findall scans
+LEGACY_PATTERNS = {
+    "upiIds": re.compile(r"[\w\.\-_]+@[\w]+"),
+    "phoneNumbers": re.compile(r"(?:\+91[\-\s]?)?[6-9]\d{9}\b"),
+    "phishingLinks": re.compile(r"https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+\S*"),
+    "bankAccounts": re.compile(r"\b\d{9,18}\b"),
+    "suspiciousKeywords": re.compile(r"(?i)\b(urgent|verify|blocked|suspended|otp|pin|kyc|verify now|account blocked|immediate|action required|confirm|update|expired|deactivated)\b"),
+}
+
+def legacy_extract(text: str):
+    return {key: list(set(pattern.findall(text))) for key, pattern in LEGACY_PATTERNS.items()}
+
+FRAGMENTS = [
+    "Hello sir, your bank account has been blocked due to suspicious activity.",
+    "You need to verify your account immediately or it will be permanently closed.",
+    "Also send money to scammer{n}@paytm for verification fee of Rs. 100.",
+    "Call me at +91 98765{n:05d} if you have any issues.",
+    "Transfer to account number 1234567{n:05d} urgently.",
+    "Click this link to verify: http://fake-bank{n}.com/verify?id={n}",
+    "beta i am not understanding. which bank u r calling from",
+    "Pay to 98{n:08d}@ybl and share the OTP.",
+    "KYC update pending, action required before 5pm. Call +919{n:09d}",
+    "ok ok wait. let me find my glasses",
+]
+
+def make_transcript(target_bytes: int, seed: int = 7) -> str:
+    """Build a realistic scam transcript of roughly target_bytes."""
+    rng = random.Random(seed)
+    lines = []
+    size = 0
+    while size < target_bytes:
+        sender = rng.choice(["scammer", "user"])
+        line = f"{sender}: {rng.choice(FRAGMENTS).format(n=rng.randint(0, 99999))}"
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+def throughput(func, text: str, repeat: int) -> float:
+    """Best-of-repeat throughput in MB/s"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return len(text.encode("utf-8")) / best / 1e6
+
+def same_entities(text: str) -> bool:
+    new = rule_engine.extract(text)
+    old = legacy_extract(text)
+    return all(set(new[key]) == set(old[key]) for key in old)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000", help="Transcript sizes in KB")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("EXTRACTION MICROBENCHMARK")
+    print("=" * 60)
+    print(f"{'size':>8} {'legacy MB/s':>12} {'single-pass MB/s':>17} {'speedup':>8} {'same':>5}")
+    for size_kb in (int(size) for size in args.sizes.split(",")):
+        text = make_transcript(size_kb * 1024)
+        legacy = throughput(legacy_extract, text, args.repeat)
+        single = throughput(rule_engine.extract, text, args.repeat)
+        print(f"{size_kb:>6}KB {legacy:>12.1f} {single:>17.1f} {single / legacy:>7.2f}x {str(same_entities(text)):>5}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Session Memory Benchmark
+Measures bytes per session (tracemalloc) for the compact SessionData against the
+previous layout (per-instance __dict__, five sets, every message and every agent
+note kept), with history retention off and on.
+
+Run with:
+    python bench_session_memory.py [--sessions 5000] [--turns 8] [--entity-pool 500]
+"""
+
+import argparse
+import gc
+import os
+import random
+import tracemalloc
+from typing import Dict, List
+
+# Settings are read at import time
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from app.core.config import settings
+from app.models.schemas import ExtractedIntelligence
+from app.services import session_manager as sm
+
+class LegacySessionData:
+    """The previous SessionData layout, for comparison"""
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.start_time = 0.0
+        self.last_activity = 0.0
+        self.message_count = 0
+        self.scam_detected = False
+        self.conversation_history: List[Dict[str, str]] = []
+        self.bank_accounts = set()
+        self.upi_ids = set()
+        self.phishing_links = set()
+        self.phone_numbers = set()
+        self.suspicious_keywords = set()
+        self.agent_notes_history: List[str] = []
+        self.extraction_watermark = 0
+        self.rolling_summary = ""
+        self.summarized_count = 0
+        self.final_callback_sent = False
+        self.intelligence_extracted_count = 0
+        self.version = 0
+
+    def add_message(self, sender: str, text: str):
+        self.conversation_history.append({"sender": sender, "text": text})
+        self.message_count += 1
+
+    def update_intelligence(self, intelligence: ExtractedIntelligence, agent_notes: str):
+        self.bank_accounts.update(intelligence.bankAccounts)
+        self.upi_ids.update(intelligence.upiIds)
+        self.phishing_links.update(intelligence.phishingLinks)
+        self.phone_numbers.update(intelligence.phoneNumbers)
+        self.suspicious_keywords.update(intelligence.suspiciousKeywords)
+        if agent_notes:
+            self.agent_notes_history.append(agent_notes)
+        self.intelligence_extracted_count = (
+            len(self.bank_accounts) + len(self.upi_ids) + len(self.phishing_links) + len(self.phone_numbers)
+        )
+
+KEYWORDS = ["urgent", "verify", "blocked", "otp", "kyc", "account blocked", "immediate"]
+
+def fresh(value: str) -> str:
+    """A new string object with the same value, as parsing a request would produce"""
+    return "".join(list(value))
+
+def make_turns(rng: random.Random, turns: int, pool: int):
+    """Scripted turns drawing payment details from a shared pool of scam identities"""
+    script = []
+    for turn in range(turns):
+        n = rng.randrange(pool)
+        intel = ExtractedIntelligence(
+            bankAccounts=[f"1234567{n:05d}"] if turn % 4 == 1 else [],
+            upiIds=[f"scammer{n}@paytm"] if turn % 3 == 0 else [],
+            phishingLinks=[f"http://fake-bank{n}.com/verify"] if turn % 4 == 2 else [],
+            phoneNumbers=[f"+91 98765{n:05d}"] if turn % 2 == 0 else [],
+            suspiciousKeywords=rng.sample(KEYWORDS, 2)
+        )
+        scammer = f"Sir your account {n} is blocked, pay scammer{n}@paytm now or call +91 98765{n:05d} today."
+        reply = f"beta i am not understanding, which bank u r calling from? turn {turn}"
+        notes = (
+            f"Turn {turn}: scammer impersonates bank staff, pushes UPI payment to scammer{n}@paytm "
+            f"and a callback number; pressure tactics: urgency, account block threat."
+        )
+        script.append((scammer, reply, intel, notes))
+    return script
+
+def bytes_per_session(factory, sessions: int, turns: int, pool: int, seed: int) -> float:
+    rng = random.Random(seed)
+    scripts = [make_turns(rng, turns, pool) for _ in range(64)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = []
+    for i in range(sessions):
+        session = factory(f"session-{i:08d}")
+        for scammer, reply, intel, notes in scripts[i % len(scripts)]:
+            session.add_message("scammer", fresh(scammer))
+            session.add_message("user", fresh(reply))
+            parsed = ExtractedIntelligence(**{
+                field: [fresh(value) for value in values] for field, values in intel.model_dump().items()
+            })
+            session.update_intelligence(parsed, fresh(notes))
+        store.append(session)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / sessions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--turns", type=int, default=8, help="Scammer messages per session")
+    parser.add_argument("--entity-pool", type=int, default=500, help="Distinct scam identities shared by sessions")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    def compact(keep_history: bool):
+        # Fresh shared table per run, so its strings are counted in the run's total
+        settings.SESSION_KEEP_HISTORY = keep_history
+        sm.entity_table = sm.EntityTable()
+        return sm.SessionData
+
+    print("=" * 60)
+    print("SESSION MEMORY BENCHMARK")
+    print("=" * 60)
+    print(f"{args.sessions} sessions x {args.turns} turns, {args.entity_pool} shared scam identities\n")
+    results = [
+        ("legacy (dict, sets, full history/notes)", bytes_per_session(LegacySessionData, args.sessions, args.turns, args.entity_pool, args.seed)),
+        ("compact, history off (default)", bytes_per_session(compact(False), args.sessions, args.turns, args.entity_pool, args.seed)),
+        ("compact, history on", bytes_per_session(compact(True), args.sessions, args.turns, args.entity_pool, args.seed)),
+    ]
+    legacy = results[0][1]
+    print(f"{'layout':<42} {'bytes/session':>14} {'vs legacy':>10}")
+    for name, size in results:
+        print(f"{name:<42} {size:>14,.0f} {size / legacy:>9.0%}")
+    print(f"\nShared entity table: {sm.entity_table.stats()['entries']} strings")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Startup Time Test - Import and startup budget for the API
+Imports app.main in a fresh interpreter (no .env, no keys) and checks that it stays
+under the import budget without loading the Gemini SDK, then runs the application
+lifespan with the fake backend and checks the startup budget.
+
+Run with:
+    python test_startup_time.py [--import-budget 1.5] [--startup-budget 2.0]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_PROBE = """
+import sys, time
+started = time.perf_counter()
+import app.main
+print(time.perf_counter() - started)
+print("google.generativeai" in sys.modules)
+"""
+
+STARTUP_PROBE = """
+import asyncio, time
+started = time.perf_counter()
+from app.main import app
+async def run():
+    async with app.router.lifespan_context(app):
+        print(time.perf_counter() - started)
+asyncio.run(run())
+"""
+
+def run_probe(code: str, extra_env: dict) -> list:
+    """Run code in a fresh interpreter outside the repo (so no .env is picked up)"""
+    env = {key: value for key, value in os.environ.items()
+           if key not in ("GEMINI_API_KEY", "YOUR_SECRET_API_KEY", "GUVI_CALLBACK_URL")}
+    env["PYTHONPATH"] = REPO
+    env["PYTHONWARNINGS"] = "ignore"
+    env.update(extra_env)
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True, timeout=60
+        )
+    if result.returncode != 0:
+        print(result.stderr)
+        raise RuntimeError("probe failed")
+    return [line for line in result.stdout.splitlines() if not line.startswith("{")]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--import-budget", type=float, default=1.5, help="Seconds allowed for import app.main")
+    parser.add_argument("--startup-budget", type=float, default=2.0, help="Seconds allowed for import + lifespan startup")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("STARTUP TIME TEST")
+    print("=" * 60)
+    failures = []
+
+    import_seconds, sdk_loaded = run_probe(IMPORT_PROBE, {})
+    import_seconds = float(import_seconds)
+    print(f"import app.main (no .env): {import_seconds:.3f}s (budget {args.import_budget}s)")
+    print(f"Gemini SDK loaded on import: {sdk_loaded}")
+    if import_seconds > args.import_budget:
+        failures.append("import over budget")
+    if sdk_loaded == "True":
+        failures.append("google.generativeai imported at module load")
+
+    (startup_seconds,) = run_probe(STARTUP_PROBE, {
+        "LLM_BACKEND": "fake", "LOG_LEVEL": "ERROR", "CALLBACK_OUTBOX_DIR": "outbox"
+    })
+    startup_seconds = float(startup_seconds)
+    print(f"import + lifespan startup (fake backend): {startup_seconds:.3f}s (budget {args.startup_budget}s)")
+    if startup_seconds > args.startup_budget:
+        failures.append("startup over budget")
+
+    if failures:
+        print(f"\n❌ {', '.join(failures)}")
+        sys.exit(1)
+    print("\n✅ Startup within budget")
+
+if __name__ == "__main__":
+    main()